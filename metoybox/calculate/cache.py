@@ -0,0 +1,172 @@
+"""
+Code for caching the fields of the calculate modules on disk, so they are reused across
+sessions, e.g. by batch jobs, notebook restarts and repeat page visits. Fields are
+stored as .npy files named by a hash of the kernel version and a key identifying the
+calculation, and are memory mapped when read.
+"""
+
+import os
+import json
+import numbers
+import hashlib
+from pathlib import Path
+from typing import Callable, Hashable, List
+import numpy as np
+from numpy.typing import NDArray, DTypeLike
+from metoybox.calculate.workspace import grid_key
+
+# The version of the calculate modules. Increment when they change the fields they
+# return, so fields cached on disk by earlier versions are no longer used.
+KERNEL_VERSION = 1
+
+# The fraction of the budget the cache is reduced to when it exceeds the budget, so
+# the directory is not scanned again on the next few stores
+EVICT_FRACTION = 0.8
+
+
+def canonical(value):
+    """
+    Get value, a key of strings, numbers, None and tuples or lists of these, with every
+    number converted to a python float, and complex numbers to pairs of floats. Equal
+    keys then encode the same whatever the types of their numbers, e.g. 0.5,
+    np.float64(0.5) and the integer 1 versus 1.0.
+    """
+    if isinstance(value, (tuple, list)):
+        return [canonical(item) for item in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, numbers.Real):
+        return float(value)
+    if isinstance(value, numbers.Complex):
+        return [float(value.real), float(value.imag)]
+    return value
+
+
+class DiskFieldCache:
+    """
+    A persistent cache of field arrays, stored as .npy files in directory so they are
+    memory mapped when read, and holding at most max_bytes of files. Files are named by
+    a hash of a canonical encoding of the kernel version and the key. The least recently
+    used files, by modification time, are removed first. The total size is tracked as
+    files are stored, so the directory is only scanned when the budget is exceeded.
+    In the browser, directory can be on a filesystem mounted in pyodide.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int = 512 * 2**20):
+        """Initialize the cache, creating directory if needed."""
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.nbytes = sum(stat.st_size for stat, _ in self.files())
+
+    def path(self, key: Hashable) -> Path:
+        """Get the path of the file storing the array for key."""
+        encoded = json.dumps(canonical([KERNEL_VERSION, key]))
+        return self.directory / f"{hashlib.sha256(encoded.encode()).hexdigest()}.npy"
+
+    def files(self) -> list[tuple[os.stat_result, Path]]:
+        """Get the stored files with their stats, least recently used first."""
+        files = []
+        for path in self.directory.glob("*.npy"):
+            try:
+                files.append((path.stat(), path))
+            except OSError:
+                continue
+        return sorted(files, key=lambda file: file[0].st_mtime)
+
+    def get(self, key: Hashable) -> NDArray | None:
+        """
+        Get the read-only memory mapped array stored under key, or None if there is
+        none or its file cannot be read.
+        """
+        path = self.path(key)
+        try:
+            array = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        try:
+            # Mark the file as recently used, if the directory is writable
+            os.utime(path)
+        except OSError:
+            pass
+        return array
+
+    def put(self, key: Hashable, array: NDArray):
+        """
+        Store array under key, removing the least recently used files if the cache
+        exceeds its budget. Arrays larger than the whole budget are not stored.
+        """
+        if array.nbytes > self.max_bytes:
+            return
+        path = self.path(key)
+        # Write to a temporary file first, so other sessions never read partial files
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            previous = path.stat().st_size if path.exists() else 0
+            with open(temporary, "wb") as file:
+                np.save(file, array)
+            nbytes = temporary.stat().st_size
+            os.replace(temporary, path)
+        except OSError:
+            temporary.unlink(missing_ok=True)
+            return
+        self.nbytes += nbytes - previous
+        if self.nbytes > self.max_bytes:
+            self.evict()
+
+    def evict(self, fraction: float = EVICT_FRACTION):
+        """
+        Remove the least recently used files until the cache is within fraction of the
+        budget. The total size is then rescanned, counting files stored by other
+        sessions.
+        """
+        files = self.files()
+        nbytes = sum(stat.st_size for stat, _ in files)
+        for stat, path in files:
+            if nbytes <= fraction * self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                # E.g. removed by another session, or mapped on platforms that forbid it
+                continue
+            nbytes -= stat.st_size
+        self.nbytes = nbytes
+
+    def clear(self):
+        """Remove all stored files."""
+        for path in self.directory.glob("*.npy"):
+            path.unlink(missing_ok=True)
+        self.nbytes = 0
+
+
+def calculate_cached(
+    function: Callable,
+    cache,
+    X: NDArray,
+    Z: NDArray,
+    *args,
+    fields: List[str],
+    dtype: DTypeLike = complex,
+    **kwargs,
+) -> dict[str, NDArray]:
+    """
+    Evaluate function(X, Z, *args, fields=fields, dtype=dtype, **kwargs), one of the
+    calculate_fields_spatial functions, reading the fields through cache, e.g. a
+    DiskFieldCache, and storing those calculated. Fields are keyed on the function, its
+    arguments, except out and workspace, and the grid contents. Fields read from the
+    cache should not be modified.
+    """
+    name = f"{function.__module__}.{function.__qualname__}"
+    options = [(option, kwargs[option]) for option in sorted(kwargs)]
+    options = tuple(item for item in options if item[0] not in ["out", "workspace"])
+    grids = (grid_key(X), grid_key(Z), np.dtype(dtype).str)
+    keys = {field: (name, tuple(args), options, grids, field) for field in fields}
+    fields_dict = {field: cache.get(keys[field]) for field in fields}
+    missing = [field for field in fields if fields_dict[field] is None]
+    if missing:
+        new_fields = function(X, Z, *args, fields=missing, dtype=dtype, **kwargs)
+        for field in missing:
+            cache.put(keys[field], new_fields[field])
+            fields_dict[field] = new_fields[field]
+    return fields_dict
@@ -0,0 +1,105 @@
+"""
+Code for declaring how fields are derived from one another. Each registered field lists
+the fields it is computed from, and the resolver evaluates only the fields needed for a
+request, computing each intermediate field once.
+"""
+
+from typing import Callable, Iterable
+from numpy.typing import NDArray
+from metoybox.calculate.workspace import Workspace, output, scratch
+
+
+class FieldGraph:
+    """
+    A registry of derived fields. Fields that are not registered are primary fields,
+    which the calculate module provides itself as known values when resolving.
+    """
+
+    def __init__(self, base: "FieldGraph | None" = None):
+        """Initialize the graph, extending the fields of base if provided."""
+        self.inputs: dict[str, list[str]] = {}
+        self.functions: dict[str, Callable] = {}
+        if base is not None:
+            self.inputs.update(base.inputs)
+            self.functions.update(base.functions)
+
+    def register(self, name: str, inputs: list[str] = []):
+        """
+        Decorator registering function(parameters, *inputs, out=None) as the way to
+        compute the field name from the fields named in inputs. If out is an array, the
+        function should fill it in place and return it.
+        """
+
+        def decorator(function: Callable):
+            self.inputs[name] = list(inputs)
+            self.functions[name] = function
+            return function
+
+        return decorator
+
+    def order(self, fields: Iterable[str]) -> list[str]:
+        """Get the requested fields and their dependencies, dependencies first."""
+        ordered = []
+        visited = set()
+
+        def visit(name):
+            if name in visited:
+                return
+            visited.add(name)
+            for input_name in self.inputs.get(name, []):
+                visit(input_name)
+            ordered.append(name)
+
+        for name in fields:
+            visit(name)
+        return ordered
+
+    def required(self, fields: Iterable[str]) -> set[str]:
+        """Get the requested fields together with every field they depend on."""
+        return set(self.order(fields))
+
+    def parities(self, primary: dict[str, int]) -> dict[str, int]:
+        """
+        Get the parities in x, i.e. +1 for even and -1 for odd, of the registered fields
+        given those of the primary fields. Fields computed from inputs of a common
+        parity inherit it, as the registered functions only scale and sum their inputs.
+        Fields without a definite parity are omitted.
+        """
+        parity = dict(primary)
+        for name in self.order(self.inputs):
+            if name in parity or not self.inputs.get(name):
+                continue
+            inputs = {parity.get(input_name) for input_name in self.inputs[name]}
+            if len(inputs) == 1 and None not in inputs:
+                parity[name] = inputs.pop()
+        return parity
+
+    def resolve(
+        self,
+        fields: Iterable[str],
+        parameters: dict,
+        known: dict | None = None,
+        out: dict[str, NDArray] | None = None,
+        workspace: Workspace | None = None,
+    ) -> dict:
+        """
+        Compute the requested fields and their dependencies. Known values, e.g. the
+        primary fields, are used as given, and are returned with the computed fields.
+        Primary fields absent from known are skipped. Requested fields are written to
+        the arrays in out where supplied, and intermediate fields to the workspace.
+        Note parameters["shape"] and parameters["dtype"] must give the shape and dtype
+        of the fields.
+        """
+        values = dict(known) if known is not None else {}
+        requested = set(fields)
+        shape, dtype = parameters["shape"], parameters["dtype"]
+        for name in self.order(fields):
+            if name in values or name not in self.functions:
+                continue
+            if name in requested:
+                target = output(out, name, shape, dtype)
+            else:
+                target = scratch(workspace, "derived_" + name, shape, dtype)
+            args = [values[input_name] for input_name in self.inputs[name]]
+            values[name] = self.functions[name](parameters, *args, out=target)
+        return values
@@ -0,0 +1,69 @@
+"""
+Code for calculating the constants of the dispersion relation shared by the solutions.
+The constants are vectorized over arrays of parameters, with branches chosen
+elementwise, and memoized for repeated scalar calls, e.g. from slider events.
+"""
+
+import functools
+import numpy as np
+from typing import NamedTuple
+from numpy.typing import NDArray, ArrayLike
+
+
+class DispersionConstants(NamedTuple):
+    """
+    The constants used in the solutions. Here B_sq = -sigma_hat^2 * (1 + M^2/N^2) -
+    f^2 - M^2, C^2 = sigma_hat^2 / N^2 + 1 and A = B / C, with the sign of A chosen so
+    that Im(1/A) >= 0. Of the roots of g^2 A^2 + 2gM - 1 = 0, g_p is the one with
+    positive imaginary part and g_n is the other.
+    """
+
+    A: NDArray
+    B: NDArray
+    C: NDArray
+    B_sq: NDArray
+    g_p: NDArray
+    g_n: NDArray
+
+
+def _calculate_constants(f_omega, alpha_omega, N_omega, sigma, M):
+    """Calculate the constants elementwise over arrays of the parameters."""
+    sigma_hat = 1j * sigma + alpha_omega
+    B_sq = -(sigma_hat**2) * (1 + 1 / N_omega**2 * M**2) - f_omega**2 - M**2
+    B_sq = np.asarray(B_sq, dtype=np.complex128)
+    B = np.sqrt(B_sq)
+    C = np.sqrt(np.asarray(1 / N_omega**2 * sigma_hat**2 + 1, dtype=np.complex128))
+    A = B / C
+    A = np.where(np.imag(1 / A) < 0, -A, A)
+
+    root = np.sqrt(M**2 / A**2 + 1)
+    g_1 = 1 / A * (-M / A + root)
+    g_2 = 1 / A * (-M / A - root)
+    g_p = np.where(np.imag(g_1) > 0, g_1, g_2)
+    g_n = np.where(np.imag(g_1) > 0, g_2, g_1)
+    constants = np.broadcast_arrays(A, B, C, B_sq, g_p, g_n)
+    return DispersionConstants(*constants)
+
+
+@functools.lru_cache(maxsize=256)
+def _calculate_constants_scalar(f_omega, alpha_omega, N_omega, sigma, M):
+    """Calculate and memoize the constants for scalar parameters."""
+    constants = _calculate_constants(f_omega, alpha_omega, N_omega, sigma, M)
+    return DispersionConstants(*[np.complex128(c) for c in constants])
+
+
+def calculate_constants(
+    f_omega: ArrayLike,
+    alpha_omega: ArrayLike,
+    N_omega: ArrayLike,
+    sigma: ArrayLike = 1,
+    M: ArrayLike = 0,
+) -> DispersionConstants:
+    """
+    Calculate the dispersion constants. Arrays of parameters are broadcast against
+    each other, while scalar calls return complex scalars and are memoized.
+    """
+    parameters = [f_omega, alpha_omega, N_omega, sigma, M]
+    if all(np.ndim(parameter) == 0 for parameter in parameters):
+        return _calculate_constants_scalar(*[float(p) for p in parameters])
+    return _calculate_constants(*[np.asarray(p, dtype=float) for p in parameters])
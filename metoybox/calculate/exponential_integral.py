@@ -0,0 +1,254 @@
+"""
+Scaled complex exponential integrals. The land-sea solutions only ever need Ei(z) in
+the products exp(-z) * Ei(z) and exp(z) * Ei(-z), so we evaluate those products
+directly. This avoids the overflow and cancellation of forming exp(+-z) and Ei(-+z)
+separately, and lets the power series be shared between z and -z.
+"""
+
+import math
+import numpy as np
+from numpy.typing import NDArray
+
+# Radius below which the power series is used for both z and -z.
+SERIES_RADIUS = 4.0
+# Relative accuracy targeted by the power series.
+SERIES_TOLERANCE = 1e-16
+# Continued fraction depths for |z| in [lower, upper) bands beyond SERIES_RADIUS. The
+# depths give a relative error of about 5e-15 at the lower end of each band.
+CONTINUED_FRACTION_BANDS = [(4.0, 8.0, 40), (8.0, 16.0, 34), (16.0, 32.0, 22)]
+CONTINUED_FRACTION_BANDS += [(32.0, 64.0, 12)]
+# Radius beyond which the asymptotic expansion is used, and its number of terms.
+ASYMPTOTIC_RADIUS = 64.0
+ASYMPTOTIC_TERMS = 14
+# Spacing of the 1-D grid used when interpolating along a line Im(u) = c, as a fraction
+# of |c|. The cubic Hermite interpolation then has a relative error of about 1e-9.
+INTERPOLATION_SPACING = 0.02
+# Number of elements interpolated at a time.
+INTERPOLATION_CHUNK = 8192
+
+# Coefficients 1 / (n n!) of the power series sum_{n>=1} u^n / (n n!). Note n <= 160
+# covers |u| < ASYMPTOTIC_RADIUS, and larger n would underflow.
+_MAX_SERIES_TERMS = 160
+_SERIES_COEFFICIENTS = np.zeros(_MAX_SERIES_TERMS + 1)
+for _n in range(1, _MAX_SERIES_TERMS + 1):
+    _SERIES_COEFFICIENTS[_n] = math.exp(-math.lgamma(_n + 1) - math.log(_n))
+
+
+def _series_length(radius: float, real_max: float) -> int:
+    """
+    Get the number of power series terms needed so the truncation error in
+    exp(u) * E1(u) is below SERIES_TOLERANCE, where |u| <= radius and Re(u) <= real_max.
+    """
+    log_tolerance = math.log(SERIES_TOLERANCE / (1 + radius)) - real_max
+    n = max(int(math.ceil(radius)), 1)
+    log_radius = math.log(max(radius, 1e-300))
+    while n < _MAX_SERIES_TERMS:
+        log_term = n * log_radius - math.lgamma(n + 1) - math.log(n)
+        if log_term < log_tolerance:
+            break
+        n += 1
+    return n
+
+
+def _series_sums(u: NDArray, real_max: float) -> tuple[NDArray, NDArray]:
+    """
+    Get the even and odd parts of sum_{n>=1} u^n / (n n!) by Horner's method in u^2.
+    The power series of E1(u) and E1(-u) differ only in the sign of the odd part.
+    """
+    length = _series_length(float(np.max(np.abs(u))), real_max)
+    coefficients = _SERIES_COEFFICIENTS[: length + 1]
+    u_sq = u * u
+    even = np.zeros_like(u)
+    for coefficient in coefficients[-1 - (length % 2) : 0 : -2]:
+        even += coefficient
+        even *= u_sq
+    odd = np.zeros_like(u)
+    for coefficient in coefficients[length - 1 + (length % 2) : 0 : -2]:
+        odd *= u_sq
+        odd += coefficient
+    odd *= u
+    return even, odd
+
+
+def _scaled_e1_continued_fraction(u: NDArray, depth: int) -> NDArray:
+    """Calculate exp(u) * E1(u) from the even contraction of its continued fraction."""
+    tail = np.zeros_like(u)
+    for k in range(depth, 0, -1):
+        # tail = k^2 / (u + 2k + 1 - tail)
+        np.subtract(u + (2 * k + 1), tail, out=tail)
+        np.divide(k * k, tail, out=tail)
+    return 1 / (u + 1 - tail)
+
+
+def _scaled_e1_asymptotic(u: NDArray) -> NDArray:
+    """Calculate exp(u) * E1(u) from its asymptotic expansion."""
+    reciprocal = 1 / u
+    term = reciprocal.copy()
+    total = reciprocal.copy()
+    for n in range(1, ASYMPTOTIC_TERMS):
+        term *= -n * reciprocal
+        total += term
+    return total
+
+
+def _scaled_e1_outer(u: NDArray) -> NDArray:
+    """Calculate exp(u) * E1(u) for |u| >= SERIES_RADIUS, choosing regimes per element."""
+    result = np.empty_like(u)
+    radius = np.abs(u)
+    # Near the negative real axis the continued fraction converges slowly, but the
+    # power series loses at most a factor of exp(|u| + Re(u)) to cancellation.
+    near_cut = (radius + u.real < SERIES_RADIUS) & (radius < ASYMPTOTIC_RADIUS)
+    if np.any(near_cut):
+        u_cut = u[near_cut]
+        even, odd = _series_sums(u_cut, float(np.max(u_cut.real)))
+        series = -np.euler_gamma - np.log(u_cut) - (even - odd)
+        result[near_cut] = np.exp(u_cut) * series
+    for lower, upper, depth in CONTINUED_FRACTION_BANDS:
+        band = (radius >= lower) & (radius < upper) & ~near_cut
+        if np.any(band):
+            result[band] = _scaled_e1_continued_fraction(u[band], depth)
+    far = radius >= ASYMPTOTIC_RADIUS
+    if np.any(far):
+        result[far] = _scaled_e1_asymptotic(u[far])
+    return result
+
+
+def scaled_e1_pair(
+    u: NDArray, out: tuple[NDArray, NDArray] | None = None
+) -> tuple[NDArray, NDArray]:
+    """
+    Calculate exp(u) * E1(u) and exp(-u) * E1(-u) using the principal branch of E1.
+    The power series is used for |u| < SERIES_RADIUS, continued fractions for moderate
+    |u| and the asymptotic expansion for large |u|, with the regime chosen per element.
+    The results are written to the arrays in out if provided.
+    """
+    u = np.asarray(u, dtype=np.complex128)
+    e1_p, e1_n = out if out is not None else (np.empty_like(u), np.empty_like(u))
+    small = np.abs(u) < SERIES_RADIUS
+    if np.any(small):
+        u_small = u[small]
+        even, odd = _series_sums(u_small, float(np.max(np.abs(u_small.real))))
+        # For small u, exp(-u) = 1 / exp(u) cannot overflow. Note also that
+        # log(-u) = log(u) - i*pi*sign(Im(u)), with signed zeros matching np.log.
+        exp_u = np.exp(u_small)
+        log_u = np.log(u_small)
+        sign = np.copysign(1, u_small.imag)
+        e1_p[small] = exp_u * (-np.euler_gamma - log_u - (even - odd))
+        log_neg_u = log_u - 1j * np.pi * sign
+        e1_n[small] = (-np.euler_gamma - log_neg_u - (even + odd)) / exp_u
+    large = ~small
+    if np.any(large):
+        u_large = u[large]
+        e1_p[large] = _scaled_e1_outer(u_large)
+        e1_n[large] = _scaled_e1_outer(-u_large)
+    return e1_p, e1_n
+
+
+def scaled_e1_pair_interpolated(
+    u: NDArray, out: tuple[NDArray, NDArray] | None = None
+) -> tuple[NDArray, NDArray] | None:
+    """
+    Calculate exp(u) * E1(u) and exp(-u) * E1(-u) where u lies on a line Im(u) = c with
+    c non-zero, so both are smooth functions of Re(u). They are evaluated on a 1-D grid
+    of Re(u), then interpolated by cubic Hermite polynomials using the derivatives
+    d/du (exp(u) * E1(u)) = exp(u) * E1(u) - 1 / u, and similarly for -u. Returns None
+    if the 1-D grid would not be smaller than u, in which case u should be evaluated
+    directly.
+    """
+    u = np.asarray(u, dtype=np.complex128)
+    c = np.ravel(u.imag)[0]
+    if c == 0 or np.any(u.imag != c):
+        return None
+    s_min, s_max = np.min(u.real), np.max(u.real)
+    spacing = INTERPOLATION_SPACING * abs(c)
+    length = int(np.ceil((s_max - s_min) / spacing)) + 2
+    if 2 * length >= u.size:
+        return None
+    u_grid = s_min + spacing * np.arange(length) + 1j * c
+    e1_p_grid, e1_n_grid = scaled_e1_pair(u_grid)
+    # The values and derivatives with respect to Re(u), scaled by the spacing, at
+    # either end of each cell of the grid
+    reciprocal = 1 / u_grid
+    derivative_p = (e1_p_grid - reciprocal) * spacing
+    derivative_n = (-e1_n_grid - reciprocal) * spacing
+    tables = []
+    for grid, derivative in [(e1_p_grid, derivative_p), (e1_n_grid, derivative_n)]:
+        tables.append([grid[:-1], derivative[:-1], grid[1:], derivative[1:]])
+
+    e1_p, e1_n = out if out is not None else (np.empty_like(u), np.empty_like(u))
+    results = [e1_p, e1_n]
+    flat_results = [np.ascontiguousarray(result).reshape(-1) for result in results]
+    flat_s = np.ascontiguousarray(u.real).reshape(-1)
+    # Interpolate in chunks, so the temporaries stay in cache
+    for start in range(0, flat_s.size, INTERPOLATION_CHUNK):
+        chunk = slice(start, start + INTERPOLATION_CHUNK)
+        position = flat_s[chunk] - s_min
+        position /= spacing
+        index = np.minimum(position.astype(np.intp), length - 2)
+        t = position - index
+        one_minus_t = 1 - t
+        h_10 = t * one_minus_t * one_minus_t
+        h_11 = -t * t * one_minus_t
+        h_01 = t * t * (3 - 2 * t)
+        h_00 = 1 - h_01
+        weights = [h_00, h_10, h_01, h_11]
+        for flat_result, table in zip(flat_results, tables):
+            result = flat_result[chunk]
+            np.multiply(table[0][index], weights[0], out=result)
+            for values, weight in zip(table[1:], weights[1:]):
+                result += values[index] * weight
+    for result, flat_result in zip(results, flat_results):
+        if not np.shares_memory(result, flat_result):
+            result[...] = flat_result.reshape(result.shape)
+    return e1_p, e1_n
+
+
+def branch_offset(z: NDArray, theta_b: float = np.pi / 2) -> NDArray:
+    """
+    Get the integer n such that Ei(z) = -E1(-z) + i*pi*n, where Ei has its branch cut
+    in direction theta_b and E1 is the principal branch.
+    """
+    # The principal Ei(z) and -E1(-z) differ by i*pi*sign(Im(z)), with signed zeros
+    # resolved consistently with np.log
+    offset = np.copysign(1, z.imag).astype(int)
+    if 0 <= theta_b < np.pi:
+        offset -= 2 * (np.angle(z) > theta_b)
+    elif -np.pi < theta_b < 0:
+        offset += 2 * (np.angle(z) < theta_b)
+    return offset
+
+
+def expi_pair(
+    z: NDArray,
+    theta_b: tuple[float, float] = (np.pi / 2, np.pi / 2),
+    pi_multiple: tuple[int, int] = (0, 0),
+    out: tuple[NDArray, NDArray] | None = None,
+    interpolate: bool = False,
+) -> tuple[NDArray, NDArray]:
+    """
+    Calculate the products exp(-z) * (Ei(z) + i*pi*k_p) and exp(z) * (Ei(-z) + i*pi*k_n),
+    where (k_p, k_n) = pi_multiple. The branch cut of Ei is in direction theta_b[0] for
+    the first product, and theta_b[1] for the second. The products are written to the
+    arrays in out if provided. If interpolate is True and z lies on a line of constant
+    non-zero imaginary part, the smooth scaled E1 parts are interpolated along the line.
+    """
+    z = np.asarray(z, dtype=np.complex128)
+    # Note exp(-z) * Ei(z) = -exp(-z) * E1(-z) + i*pi*n*exp(-z)
+    scaled = scaled_e1_pair_interpolated(-z, out=out) if interpolate else None
+    if scaled is None:
+        scaled = scaled_e1_pair(-z, out=out)
+    scaled_e1_z, scaled_e1_neg_z = scaled
+    np.negative(scaled_e1_z, out=scaled_e1_z)
+    np.negative(scaled_e1_neg_z, out=scaled_e1_neg_z)
+    product_p = _add_residue(scaled_e1_z, z, theta_b[0], pi_multiple[0])
+    product_n = _add_residue(scaled_e1_neg_z, -z, theta_b[1], pi_multiple[1])
+    return product_p, product_n
+
+
+def _add_residue(product: NDArray, z: NDArray, theta_b: float, pi_multiple: int):
+    """Add i*pi*n*exp(-z) to product in place, evaluating exp(-z) only where n != 0."""
+    n = branch_offset(z, theta_b) + pi_multiple
+    residue = n != 0
+    if np.any(residue):
+        product[residue] += 1j * np.pi * n[residue] * np.exp(-z[residue])
+    return product
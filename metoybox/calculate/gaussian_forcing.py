@@ -1,21 +1,13 @@
 import numpy as np
 from typing import List
-from numpy.typing import NDArray
-from metoybox.calculate.utils import recover_polarized_default
+from numpy.typing import NDArray, DTypeLike
+from metoybox.calculate.dispersion import calculate_constants
+from metoybox.calculate.utils import POLARIZED_FIELDS, polarized_parameters
+from metoybox.calculate.workspace import Workspace, targets
+from metoybox.calculate.image_sum import sum_images, source_sign
 
-
-def calculate_constants(f_omega, alpha_omega, N_omega, sigma):
-    """Calculate the constants B, C, A, a_n, a_p used in the solution."""
-
-    B = (-((1j * sigma + alpha_omega) ** 2) - f_omega**2) ** (1 / 2)
-    C = (1 / (N_omega**2) * (1j * sigma + alpha_omega) ** 2 + 1) ** (1 / 2)
-    B, C = np.complex128(B), np.complex128(C)
-    A = B / C
-
-    if np.imag(1 / A) < 0:
-        A = -A
-
-    return A, B
+# The parities in x of the fields, as the forcing is symmetric about x = 0
+PARITY = POLARIZED_FIELDS.parities({"psi": -1, "phi": 1, "u": -1, "w": 1})
 
 
 def calculate_fields_spatial(
@@ -27,63 +19,52 @@ def calculate_fields_spatial(
     alpha_omega: float,
     N_omega: float,
     fields: List[str] = ["psi", "u", "w"],
+    out: dict[str, NDArray] | None = None,
+    workspace: Workspace | None = None,
+    dtype: DTypeLike = complex,
 ):
-    """Get the psi_p_tilde solution."""
-
-    cond_1 = Z <= z_f
-    cond_2 = Z > z_f
-
-    psi = np.zeros_like(Z, dtype=complex)
-    u = np.zeros_like(Z, dtype=complex)
-    w = np.zeros_like(Z, dtype=complex)
+    """
+    Get the psi_p_tilde solution. X and Z may be open grids, e.g. from
+    np.meshgrid(x, z, sparse=True). Fields are written in place to the arrays in out
+    where supplied, with scratch arrays taken from the workspace. The fields are
+    calculated in the complex dtype given.
+    """
+
+    # Only compute the requested fields and those they depend on
+    required = POLARIZED_FIELDS.required(fields)
+    shape = np.broadcast_shapes(np.shape(X), np.shape(Z))
+    out = targets(out, workspace, required - set(fields), shape, dtype)
     sigma_hat = 1j * sigma + alpha_omega
-    phi = np.zeros_like(Z, dtype=complex)
-
-    A, B = calculate_constants(f_omega, alpha_omega, N_omega, sigma)
-
-    t_1 = 1 / A * (z_f + Z[cond_1])
-    t_2 = 1 / A * (z_f - Z[cond_1])
-    t_3 = -t_2
-    t_4 = -t_1
-
-    t_1 += X[cond_1]
-    t_2 += X[cond_1]
-    t_3 += X[cond_1]
-    t_4 += X[cond_1]
+    constants = calculate_constants(f_omega, alpha_omega, N_omega, sigma)
+    A, B = constants.A, constants.B
 
     D = 1j * A * np.exp(-(sigma**2) / 4) / (4 * np.sqrt(np.pi) * B**2)
-
-    psi[cond_1] = D * (-1 / t_1 + 1 / t_2 + 1 / t_3 - 1 / t_4)
-    u[cond_1] = (D / A) * (1 / t_1**2 + 1 / t_2**2 - 1 / t_3**2 - 1 / t_4**2)
-    w[cond_1] = -D * (1 / t_1**2 - 1 / t_2**2 - 1 / t_3**2 + 1 / t_4**2)
     A_phi = -(sigma_hat + f_omega**2 / sigma_hat) * D / A
-    phi[cond_1] = A_phi * (-1 / t_1 - 1 / t_2 + 1 / t_3 + 1 / t_4)
-
-    t_1 = 1 / A * (z_f + Z[cond_2])
-    t_2 = 1 / A * (-z_f + Z[cond_2])
-    t_3 = -t_2
-    t_4 = -t_1
-
-    t_1 += X[cond_2]
-    t_2 += X[cond_2]
-    t_3 += X[cond_2]
-    t_4 += X[cond_2]
-
-    psi[cond_2] = D * (-1 / t_1 + 1 / t_2 + 1 / t_3 - 1 / t_4)
-    u[cond_2] = (D / A) * (1 / t_1**2 - 1 / t_2**2 + 1 / t_3**2 - 1 / t_4**2)
-    w[cond_2] = -D * (1 / t_1**2 - 1 / t_2**2 - 1 / t_3**2 + 1 / t_4**2)
-    phi[cond_2] = A_phi * (-1 / t_1 + 1 / t_2 - 1 / t_3 + 1 / t_4)
-
-    fields_dict = {}
-    fields_dict["psi"] = psi
-    fields_dict["u"] = u
-    fields_dict["w"] = w
-
-    args = [u, w, f_omega, alpha_omega, fields]
-    polarized_fields = recover_polarized_default(*args)
-    fields_dict.update(polarized_fields)
 
-    if "phi" in fields:
-        fields_dict["phi"] = phi
+    # Writing the images in terms of |z - z_f| makes them the same above and below the
+    # source, with only the signs of the second and third terms in u and phi changing
+    s = source_sign(Z, z_f)
+    images = [
+        (1 / A * (z_f + Z), X),
+        (1 / A * np.abs(Z - z_f), X),
+        (-1 / A * np.abs(Z - z_f), X),
+        (-1 / A * (z_f + Z), X),
+    ]
+    reciprocal_coefficients = {}
+    if "psi" in required:
+        reciprocal_coefficients["psi"] = [-D, D, D, -D]
+    if "phi" in required:
+        reciprocal_coefficients["phi"] = [-A_phi, -A_phi * s, A_phi * s, A_phi]
+    square_coefficients = {}
+    if "u" in required:
+        square_coefficients["u"] = [D / A, D / A * s, -D / A * s, -D / A]
+    if "w" in required:
+        square_coefficients["w"] = [-D, D, D, -D]
+    args = [images, reciprocal_coefficients, square_coefficients]
+    fields_dict = sum_images(*args, out=out, workspace=workspace, dtype=dtype)
+
+    parameters = polarized_parameters(X, Z, f_omega, alpha_omega, dtype=dtype)
+    args = [fields, parameters, fields_dict]
+    fields_dict = POLARIZED_FIELDS.resolve(*args, out=out, workspace=workspace)
 
     return fields_dict
@@ -0,0 +1,76 @@
+"""
+Code for evaluating the sums over image sources shared by the elevated and sloped
+point-type forcings. These solutions are all of the form sum_i c_i / L_i for psi and
+phi, and sum_i d_i / L_i^2 for u and w, where each image L_i is a function of z plus a
+function of x.
+"""
+
+import numpy as np
+from numpy.typing import NDArray, DTypeLike
+from metoybox.calculate.workspace import Workspace, output, scratch
+
+
+def sum_images(
+    images: list[tuple[NDArray, NDArray]],
+    reciprocal_coefficients: dict[str, list],
+    square_coefficients: dict[str, list],
+    out: dict[str, NDArray] | None = None,
+    workspace: Workspace | None = None,
+    dtype: DTypeLike = complex,
+) -> dict[str, NDArray]:
+    """
+    Evaluate the sums sum_i c_i / L_i and sum_i d_i / L_i^2 in a single pass over the
+    images. Each image is given as a (z_term, x_term) pair with L_i = z_term + x_term,
+    so open grids are only broadcast when forming L_i. The coefficients are keyed by
+    output field name, and may be scalars or arrays that broadcast against L_i, e.g. a
+    column of signs that differ above and below the source. Only the fields given
+    coefficients are computed, and the squares only if some field needs them. The sums
+    are accumulated in place in the arrays in out where supplied, with the work arrays
+    taken from the workspace. Each L_i is formed at the precision of its terms, then
+    the sums are evaluated in the complex dtype given.
+    """
+    terms = [term for image in images for term in image]
+    shape = np.broadcast_shapes(*[np.shape(term) for term in terms])
+    names = list(reciprocal_coefficients.keys()) + list(square_coefficients.keys())
+    outputs = {name: output(out, name, shape, dtype) for name in names}
+    if not outputs:
+        return outputs
+    for array in outputs.values():
+        array.fill(0)
+    # Cast the coefficients so they do not promote the sums to a higher precision
+    reciprocal_coefficients = _cast(reciprocal_coefficients, dtype)
+    square_coefficients = _cast(square_coefficients, dtype)
+
+    # Reuse the same work arrays for every image, computing each reciprocal only once
+    reciprocal = scratch(workspace, "reciprocal", shape, dtype)
+    square = scratch(workspace, "square", shape, dtype)
+    weighted = scratch(workspace, "weighted", shape, dtype)
+    for i, (z_term, x_term) in enumerate(images):
+        np.add(z_term, x_term, out=reciprocal)
+        np.divide(1, reciprocal, out=reciprocal)
+        for name, coefficients in reciprocal_coefficients.items():
+            np.multiply(reciprocal, coefficients[i], out=weighted)
+            outputs[name] += weighted
+        if square_coefficients:
+            np.multiply(reciprocal, reciprocal, out=square)
+        for name, coefficients in square_coefficients.items():
+            np.multiply(square, coefficients[i], out=weighted)
+            outputs[name] += weighted
+
+    return outputs
+
+
+def _cast(coefficients: dict[str, list], dtype: DTypeLike) -> dict[str, list]:
+    """Cast each coefficient to the dtype given."""
+    cast = {}
+    for name, values in coefficients.items():
+        cast[name] = [np.asarray(value, dtype=dtype) for value in values]
+    return cast
+
+
+def source_sign(Z: NDArray, z_f: float) -> NDArray:
+    """
+    Get +1 at or below the source height z_f and -1 above it. This is the sign of
+    d|z - z_f|/dz, and so selects the above or below source pattern of the image sums.
+    """
+    return np.where(Z <= z_f, 1.0, -1.0)
@@ -1,38 +1,18 @@
 import numpy as np
-from scipy.special import expi as sp_expi
 from typing import List
-from numpy.typing import NDArray
-from metoybox.calculate.utils import recover_polarized_default
+from numpy.typing import NDArray, DTypeLike
+from metoybox.calculate.dispersion import calculate_constants
+from metoybox.calculate.utils import POLARIZED_FIELDS, polarized_parameters, coefficient
+from metoybox.calculate.workspace import Workspace, output, scratch, targets
+from metoybox.calculate.workspace import cached, grid_key, validate
+from metoybox.calculate.exponential_integral import expi_pair
 
+# The parities in x of the fields. Note Q - exp(-z) / 2 is odd, but Q has no parity.
+PARITY = POLARIZED_FIELDS.parities({"psi": 1, "u": 1, "w": -1})
 
-def expi(z, theta_b=np.pi / 2):
-    """
-    Calculates the exponential integral Ei(z) with a custom branch cut in direction
-    theta_b.
-    """
-    principal_value = sp_expi(z)
-    z_angle = np.angle(z)
-    correction = np.zeros_like(principal_value, dtype=np.complex128)
-    if 0 <= theta_b < np.pi:
-        mask = (z_angle > theta_b) & (z_angle <= np.pi)
-        correction[mask] = -2j * np.pi
-    elif -np.pi < theta_b < 0:
-        mask = (z_angle > -np.pi) & (z_angle < theta_b)
-        correction[mask] = 2j * np.pi
-    return principal_value + correction
-
-
-def calculate_constants(f_omega, alpha_omega, N_omega, sigma=1):
-    """Calculate the constants used in the solution."""
-
-    sigma_hat = 1j * sigma + alpha_omega
-    B = np.sqrt(-(sigma_hat**2) - f_omega**2)
-    C = np.sqrt(1 / N_omega**2 * sigma_hat**2 + 1)
-    B, C = np.complex128(B), np.complex128(C)
-    A = B / C
-    if np.imag(1 / A) < 0:
-        A = -A
-    return A, B
+# The dtype of the full size temporaries, i.e. the arguments of the exponential
+# integrals and the integrals themselves, whatever the dtype of the fields
+INTERMEDIATE_DTYPE = np.complex128
 
 
 def calculate_fields_spatial(
@@ -43,57 +23,111 @@ def calculate_fields_spatial(
     alpha_omega: float,
     N_omega: float,
     fields: List[str] = ["psi", "u", "w"],
+    out: dict[str, NDArray] | None = None,
+    workspace: Workspace | None = None,
+    dtype: DTypeLike = complex,
 ):
     """
-    Calculate the spatial structures of the solutions. The full solutions are then,
-    for instance, psi = np.real(psi_tilde * np.exp(1j * t)).
+    Calculate the spatial structures of the solutions. The full solutions are then, for
+    instance, psi = np.real(psi_tilde * np.exp(1j * t)). Note X and Z must be grids from
+    np.meshgrid(x, z), as the coastal terms are evaluated on one row. Fields are written
+    in place to the arrays in out where supplied, with scratch arrays taken from the
+    workspace. The fields are calculated in the complex dtype given, but the arguments
+    of the exponential integrals are always formed in double precision, as the terms
+    grow and cancel far from the coast.
     """
-    A, B = calculate_constants(f_omega, alpha_omega, N_omega)
-
-    X_piL = X + 1j * L
-    X_miL = X - 1j * L
-
-    L_1 = (1 / A) * Z + X_piL
-    L_2 = -(1 / A) * Z + X_miL
-
-    I = np.zeros_like(Z, dtype=complex)
-
-    D = -1 / (B**2 * 4 * np.pi * 1j)
-
-    I_1 = -np.exp(A * L_1) * (-1j * np.pi - expi(-A * L_1))
-    I_2 = np.exp(A * X_piL) * (-1j * np.pi - expi(-A * X_piL)) * np.exp(-Z)
-
-    I_3 = np.exp(-A * L_1) * (1j * np.pi - expi(A * L_1, theta_b=np.pi))
-    I_4 = (
-        -np.exp(-A * X_piL) * (1j * np.pi - expi(A * X_piL, theta_b=np.pi)) * np.exp(-Z)
-    )
-
-    I_5 = -np.exp(A * L_2) * (expi(-A * L_2, theta_b=np.pi) + 1j * np.pi)
-    I_6 = (
-        np.exp(A * X_miL) * (expi(-A * X_miL, theta_b=np.pi) + 1j * np.pi) * np.exp(-Z)
-    )
-
-    I_7 = np.exp(-A * L_2) * (expi(A * L_2) + 1j * np.pi)
-    I_8 = -np.exp(-A * X_miL) * (expi(A * X_miL) + 1j * np.pi) * np.exp(-Z)
-
-    I = I_1 + I_2 + I_3 + I_4 + I_5 + I_6 + I_7 + I_8
-    I_u = I_1 - I_2 - I_3 - I_4 - I_5 - I_6 + I_7 - I_8
-    I_w = A * (-I_1 - I_2 + I_3 + I_4 - I_5 - I_6 + I_7 + I_8)
-    psi = I * D * A
-    u = I_u * D * A
-    w = I_w * D * A
-
+    # Only compute the requested fields and those they depend on
+    required = POLARIZED_FIELDS.required(fields)
+    shape = np.broadcast_shapes(np.shape(X), np.shape(Z))
+    out = targets(out, workspace, required - set(fields), shape, dtype)
+    constants = calculate_constants(f_omega, alpha_omega, N_omega)
+    A, B = constants.A, constants.B
+
+    parameters = polarized_parameters(X, Z, f_omega, alpha_omega, dtype=dtype)
+    x = X[:1, :]
+    exp_z = np.exp(-Z[:, :1])
     fields_dict = {}
-    fields_dict["psi"] = psi
-    fields_dict["u"] = u
-    fields_dict["w"] = w
-
-    Q = 1 / np.pi * (np.pi / 2 + np.arctan(X / L)) * np.exp(-Z)
-    fields_dict["Q"] = Q
 
-    args = [u, w, f_omega, alpha_omega, fields]
-    polarized_fields = recover_polarized_default(*args)
-    fields_dict.update(polarized_fields)
+    if required & {"psi", "u", "w"}:
+        D = -1 / (B**2 * 4 * np.pi * 1j)
+
+        # Get the products exp(-A*L) * (Ei(A*L) + ...) and exp(A*L) * (Ei(-A*L) + ...)
+        # directly, as forming the exponentials and Ei separately overflows and cancels.
+        branches_1 = {"theta_b": (np.pi, np.pi / 2), "pi_multiple": (-1, 1)}
+        branches_2 = {"theta_b": (np.pi / 2, np.pi), "pi_multiple": (1, 1)}
+        # When alpha_omega = 0 and A is real, A * L_1 and A * L_2 vary only along the
+        # characteristics z +- A * x, so interpolate the exponential integrals from
+        # 1-D grids along the characteristic coordinates.
+        interpolate = alpha_omega == 0 and np.imag(A) == 0
+
+        # The exponential integrals depend only on A, L and the grid, so are kept in
+        # the workspace and reused while these are unchanged, e.g. when only the
+        # requested fields change
+        key = (A, L, interpolate, grid_key(X), grid_key(Z))
+        names = ["E_3", "E_1", "E_7", "E_5"]
+        E = [cached(workspace, name, key, shape) for name in names]
+        E_3, E_1, E_7, E_5 = [array for array, _ in E]
+        if not all(valid for _, valid in E):
+            # Form A * L_1 and A * L_2 in the workspace, where
+            # L_1 = (1 / A) * Z + X + 1j * L and L_2 = -(1 / A) * Z + X - 1j * L
+            AL_1 = np.multiply(Z, 1 / A, out=scratch(workspace, "AL_1", shape))
+            AL_1 += x + 1j * L
+            AL_1 *= A
+            AL_2 = np.multiply(Z, -(1 / A), out=scratch(workspace, "AL_2", shape))
+            AL_2 += x - 1j * L
+            AL_2 *= A
+            out_1, out_2 = (E_3, E_1), (E_7, E_5)
+            E_3, E_1 = expi_pair(AL_1, **branches_1, out=out_1, interpolate=interpolate)
+            E_7, E_5 = expi_pair(AL_2, **branches_2, out=out_2, interpolate=interpolate)
+            for name in names:
+                validate(workspace, name, key)
+        # Note I_1, I_3, I_5, I_7 = E_1, -E_3, -E_5, E_7. The signs are folded into
+        # the combinations below, so no negated copies of the grids are formed.
+        # The coastal terms I_2, I_4, I_6, I_8 are functions of x times exp(-z).
+        # Evaluate them on a single row of the grid, then expand by an outer product
+        # with exp(-z).
+        E_4, E_2 = expi_pair(A * (x + 1j * L), **branches_1)
+        E_8, E_6 = expi_pair(A * (x - 1j * L), **branches_2)
+        # Excluding the exp(-z) factor, I_2, I_4, I_6, I_8 = -E_2, E_4, E_6, -E_8
+        coastal = scratch(workspace, "coastal", shape, dtype)
+
+        # Combine the terms in place. Note I_1 + I_7 and I_3 + I_5 appear in psi and u
+        # with the same or opposite signs.
+        if required & {"psi", "u"}:
+            sum_17 = scratch(workspace, "sum_17", shape, dtype)
+            sum_35 = scratch(workspace, "sum_35", shape, dtype)
+            np.add(E_1, E_7, out=sum_17)
+            # Note sum_35 = E_3 + E_5 = -(I_3 + I_5)
+            np.add(E_3, E_5, out=sum_35)
+            # I_2 + I_4 + I_6 + I_8, on the row only and in double precision like E
+            row = scratch(workspace, "coastal_row", x.shape)
+            np.subtract(E_4, E_2, out=row)
+            row += E_6
+            row -= E_8
+        if "psi" in required:
+            psi = np.subtract(sum_17, sum_35, out=output(out, "psi", shape, dtype))
+            psi += np.multiply(row, exp_z, out=coastal)
+            psi *= coefficient(parameters, D * A)
+            fields_dict["psi"] = psi
+        if "u" in required:
+            u = np.add(sum_17, sum_35, out=output(out, "u", shape, dtype))
+            u -= np.multiply(row, exp_z, out=coastal)
+            u *= coefficient(parameters, D * A)
+            fields_dict["u"] = u
+        if "w" in required:
+            # Note -I_1 + I_3 - I_5 + I_7 = E_7 - E_1 - E_3 + E_5
+            w = np.subtract(E_7, E_1, out=output(out, "w", shape, dtype))
+            w -= E_3
+            w += E_5
+            w += np.multiply(E_2 + E_4 - E_6 - E_8, exp_z, out=coastal)
+            w *= coefficient(parameters, A * D * A)
+            fields_dict["w"] = w
+
+    if "Q" in required:
+        Q_x = 1 / np.pi * (np.pi / 2 + np.arctan(x / L))
+        fields_dict["Q"] = np.multiply(Q_x, exp_z, out=output(out, "Q", shape, dtype))
+    args = [fields, parameters, fields_dict]
+    fields_dict = POLARIZED_FIELDS.resolve(*args, out=out, workspace=workspace)
 
     # phi TBD
 
@@ -1,20 +1,74 @@
 import numpy as np
 from typing import List
-from numpy.typing import NDArray
-from metoybox.calculate.utils import recover_polarized_default
+from numpy.typing import NDArray, DTypeLike
+from metoybox.calculate.dispersion import calculate_constants
+from metoybox.calculate.derived import FieldGraph
+from metoybox.calculate.workspace import Workspace, cached, grid_key, validate
+from metoybox.calculate.utils import POLARIZED_FIELDS, polarized_parameters, coefficient
 
+PLANE_WAVE_FIELDS = FieldGraph(POLARIZED_FIELDS)
 
-def calculate_constants(f_omega, alpha_omega, N_omega, sigma):
-    """Calculate the constants used in the solution."""
 
-    sigma_hat = 1j * sigma + alpha_omega
-    B = np.sqrt(-(sigma_hat**2) - f_omega**2)
-    C = np.sqrt(1 / N_omega**2 * sigma_hat**2 + 1)
-    B, C = np.complex128(B), np.complex128(C)
-    A = B / C
-    if np.imag(1 / A) < 0:
-        A = -A
-    return A, B
+@PLANE_WAVE_FIELDS.register("psi")
+def _psi(parameters, out=None):
+    if out is None:
+        out = np.empty(parameters["shape"], dtype=parameters["dtype"])
+    out[...] = parameters["psi_shape"]
+    return out
+
+
+def psi_shape(X: NDArray, Z: NDArray, k: float, m: float, out: NDArray) -> NDArray:
+    """Calculate the spatial structure of psi, which depends only on k and m."""
+    # Use an amplitude of 0.075 for psi to get plausible dimensional values. Note
+    # exp(i(kx + mz)) = exp(ikx) * exp(imz), so for open grids we only take the
+    # exponentials of a row and a column.
+    exp_x = 0.075 * np.exp(1j * k * X)
+    return np.multiply(exp_x, np.exp(1j * m * Z), out=out)
+
+
+@PLANE_WAVE_FIELDS.register("u", ["psi"])
+def _u(parameters, psi, out=None):
+    return np.multiply(psi, coefficient(parameters, 1j * parameters["m"]), out=out)
+
+
+@PLANE_WAVE_FIELDS.register("w", ["psi"])
+def _w(parameters, psi, out=None):
+    return np.multiply(psi, coefficient(parameters, -1j * parameters["k"]), out=out)
+
+
+@PLANE_WAVE_FIELDS.register("phi", ["psi"])
+def _phi(parameters, psi, out=None):
+    sigma_hat, f_omega = parameters["sigma_hat"], parameters["f_omega"]
+    k, m = parameters["k"], parameters["m"]
+    c = coefficient(parameters, -(sigma_hat + f_omega**2 / sigma_hat) * m / k)
+    return np.multiply(psi, c, out=out)
+
+
+@PLANE_WAVE_FIELDS.register("phi_x", ["phi"])
+def _phi_x(parameters, phi, out=None):
+    return np.multiply(phi, coefficient(parameters, -1j * parameters["k"]), out=out)
+
+
+@PLANE_WAVE_FIELDS.register("phi_z", ["phi"])
+def _phi_z(parameters, phi, out=None):
+    return np.multiply(phi, coefficient(parameters, -1j * parameters["m"]), out=out)
+
+
+@PLANE_WAVE_FIELDS.register("coriolis_x", ["v"])
+def _coriolis_x(parameters, v, out=None):
+    return np.multiply(v, coefficient(parameters, parameters["f_omega"]), out=out)
+
+
+@PLANE_WAVE_FIELDS.register("a_x", ["phi_x", "coriolis_x"])
+def _a_x(parameters, phi_x, coriolis_x, out=None):
+    return np.add(phi_x, coriolis_x, out=out)
+
+
+@PLANE_WAVE_FIELDS.register("a_z", ["phi_z", "b_w"])
+def _a_z(parameters, phi_z, b_w, out=None):
+    a_z = np.add(phi_z, b_w, out=out)
+    a_z *= coefficient(parameters, parameters["N_omega"] ** 2)
+    return a_z
 
 
 def calculate_fields_spatial(
@@ -26,39 +80,34 @@ def calculate_fields_spatial(
     alpha_omega: float,
     N_omega: float,
     fields: List[str] = ["psi", "u", "w"],
+    out: dict[str, NDArray] | None = None,
+    workspace: Workspace | None = None,
+    dtype: DTypeLike = complex,
 ):
     """
     Calculate the spatial structures of the solutions. The full solutions are then,
-    for instance, psi = np.real(psi_tilde * np.exp(1j * t)).
+    for instance, psi = np.real(psi_tilde * np.exp(1j * t)). X and Z may be open grids,
+    e.g. from np.meshgrid(x, z, sparse=True). Fields are written in place to the arrays
+    in out where supplied, with scratch arrays taken from the workspace. The fields are
+    calculated in the complex dtype given.
     """
-    A, B = calculate_constants(f_omega, alpha_omega, N_omega, sigma)
+    A = calculate_constants(f_omega, alpha_omega, N_omega, sigma).A
 
     m = k / A
-    # Use an amplitude of 0.075 for psi to get plausible dimensional values
-    psi = 0.075 * np.exp(1j * (k * X + m * Z))
-    u = 1j * m * psi
-    w = -1j * k * psi
-
-    fields_dict = {}
-    fields_dict["psi"] = psi
-    fields_dict["u"] = u
-    fields_dict["w"] = w
-
-    args = [u, w, f_omega, alpha_omega, fields, sigma]
-    polarized_fields = recover_polarized_default(*args)
-    fields_dict.update(polarized_fields)
-
-    sigma_hat = 1j * sigma + alpha_omega
-
-    phi = -(sigma_hat + f_omega**2 / sigma_hat) * m / k * psi
-    fields_dict["phi"] = phi
-    fields_dict["phi_x"] = -1j * k * phi
-    fields_dict["phi_z"] = -1j * m * phi
-    fields_dict["coriolis_x"] = f_omega * fields_dict["v"]
-
-    fields_dict["a_x"] = fields_dict["phi_x"] + fields_dict["coriolis_x"]
-    fields_dict["a_z"] = fields_dict["phi_z"]*N_omega**2 + fields_dict["b_w"]*N_omega**2
 
-    fields_dict["zero"] = np.zeros_like(psi)
+    parameters = polarized_parameters(X, Z, f_omega, alpha_omega, sigma, dtype)
+    # The spatial structure of psi depends only on k, m and the grid, and every other
+    # field is a scalar multiple of it, so psi is kept in the workspace and reused
+    # while k and m are unchanged
+    shape = parameters["shape"]
+    key = (k, m, grid_key(X), grid_key(Z))
+    psi, valid = cached(workspace, "psi_shape", key, shape, dtype)
+    if not valid:
+        psi_shape(X, Z, k, m, out=psi)
+        validate(workspace, "psi_shape", key)
+    parameters.update({"psi_shape": psi, "k": k, "m": m, "N_omega": N_omega})
 
-    return fields_dict
+    # Derive the other fields from the cached psi directly unless psi is requested
+    known = {} if "psi" in fields else {"psi": psi}
+    args = [fields, parameters, known]
+    return PLANE_WAVE_FIELDS.resolve(*args, out=out, workspace=workspace)
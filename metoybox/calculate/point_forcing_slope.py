@@ -1,31 +1,10 @@
 import numpy as np
 from typing import List
-from numpy.typing import NDArray
-from metoybox.calculate.utils import recover_polarized_default
-
-
-def calculate_constants(f_omega, alpha_omega, N_omega, M):
-    """Calculate the constants B, C, A, a_n, a_p used in the solution."""
-
-    B = (
-        (1 - 2 * 1j * alpha_omega - alpha_omega**2) * (1 + 1 / N_omega**2 * M**2)
-        - f_omega**2
-        - M**2
-    ) ** (1 / 2)
-    C = (1 / N_omega**2 * (-1 + 2 * 1j * alpha_omega + alpha_omega**2) + 1) ** (1 / 2)
-    B, C = np.complex128(B), np.complex128(C)
-    A = B / C
-    g_1 = 1 / A * (-M / A + np.sqrt(M**2 / A**2 + 1))
-    g_2 = 1 / A * (-M / A - np.sqrt(M**2 / A**2 + 1))
-
-    if np.imag(g_1) > 0:
-        g_p = g_1
-        g_n = g_2
-    else:
-        g_p = g_2
-        g_n = g_1
-
-    return B, g_p, g_n
+from numpy.typing import NDArray, DTypeLike
+from metoybox.calculate.dispersion import calculate_constants
+from metoybox.calculate.utils import POLARIZED_FIELDS, polarized_parameters
+from metoybox.calculate.workspace import Workspace, targets
+from metoybox.calculate.image_sum import sum_images
 
 
 def calculate_fields_spatial(
@@ -37,67 +16,66 @@ def calculate_fields_spatial(
     alpha_omega: float,
     N_omega: float,
     fields: List[str] = ["psi", "u", "w"],
+    out: dict[str, NDArray] | None = None,
+    workspace: Workspace | None = None,
+    dtype: DTypeLike = complex,
 ):
     """
-    Calculate the spatial structures of the solutions. The full solutions are then,
-    for instance, psi = np.real(psi_tilde * np.exp(1j * t)).
+    Calculate the spatial structures of the solutions. The full solutions are then, for
+    instance, psi = np.real(psi_tilde * np.exp(1j * t)). X and Z may be open grids, e.g.
+    from np.meshgrid(x, z, sparse=True), or the coordinates of a list of points. Values
+    below the slope are set to nan. Fields are written in place to the arrays in out
+    where supplied, with scratch arrays taken from the workspace. The fields are
+    calculated in the complex dtype given.
     """
 
-    B, g_p, g_n = calculate_constants(f_omega, alpha_omega, N_omega, M)
+    # Only compute the requested fields and those they depend on
+    required = POLARIZED_FIELDS.required(fields)
+    shape = np.broadcast_shapes(np.shape(X), np.shape(Z))
+    out = targets(out, workspace, required - set(fields), shape, dtype)
+    constants = calculate_constants(f_omega, alpha_omega, N_omega, M=M)
+    B, g_p, g_n = constants.B, constants.g_p, constants.g_n
 
     D = 1j / (2 * np.pi * B**2 * (g_p - g_n))
 
-    Z_sigma = Z - M * X
     mask = Z < M * X
 
-    L_1 = g_p * Z_sigma - g_n * z_f + X
-    L_2 = g_n * (Z_sigma - z_f) + X
-    L_3 = g_p * (Z_sigma - z_f) + X
-    L_4 = g_n * Z_sigma - g_p * z_f + X
     c_n = 1 - g_n * M
     c_p = 1 - g_p * M
-
-    psi = D * (-c_n / L_1 + c_n / L_2 + c_p / L_3 - c_p / L_4)
-
-    u = D * (
-        c_n * g_p / L_1**2
-        - c_n * g_n / L_2**2
-        - c_p * g_p / L_3**2
-        + c_p * g_n / L_4**2
-    )
-    w = -D * (
-        c_n * (1 - g_p * M) / L_1**2
-        - c_n * (1 - g_n * M) / L_2**2
-        - c_p * (1 - g_p * M) / L_3**2
-        + c_p * (1 - g_n * M) / L_4**2
-    )
-
-    fields_dict = {}
-    fields_dict["psi"] = psi
-    fields_dict["u"] = u
-    fields_dict["w"] = w
-
-    args = [u, w, f_omega, alpha_omega, fields]
-    polarized_fields = recover_polarized_default(*args)
-    fields_dict.update(polarized_fields)
-
-    sigma_hat = 1j + alpha_omega
-
-    if "phi" in fields:
-        phi = (
-            -D
-            * (sigma_hat + 1 / sigma_hat * f_omega**2)
-            * (
-                c_n * g_p / L_1 / (-g_p * M + 1)
-                - c_n * g_n / L_2 / (-g_n * M + 1)
-                - c_p * g_p / L_3 / (-g_p * M + 1)
-                + c_p * g_n / L_4 / (-g_n * M + 1)
-            )
-        )
-        fields_dict["phi"] = phi
-
-    for key in fields_dict:
-        # Mask values below the slope
-        fields_dict[key][mask] = (1 + 1j) * np.nan
+    # Note g * (Z - M * X) + X = g * Z + (1 - g * M) * X, so each image L is a function
+    # of z plus a function of x, and open grids are only broadcast when the two are added
+    images = [
+        (g_p * Z - g_n * z_f, c_p * X),
+        (g_n * (Z - z_f), c_n * X),
+        (g_p * (Z - z_f), c_p * X),
+        (g_n * Z - g_p * z_f, c_n * X),
+    ]
+    reciprocal_coefficients = {}
+    if "psi" in required:
+        reciprocal_coefficients["psi"] = [-D * c_n, D * c_n, D * c_p, -D * c_p]
+    if "phi" in required:
+        # Note the factors 1 / (1 - g * M) in phi cancel against c_n and c_p
+        sigma_hat = 1j + alpha_omega
+        D_phi = -D * (sigma_hat + 1 / sigma_hat * f_omega**2)
+        phi_coefficients = [c_n * g_p / c_p, -g_n, -g_p, c_p * g_n / c_n]
+        reciprocal_coefficients["phi"] = [D_phi * c for c in phi_coefficients]
+    square_coefficients = {}
+    if "u" in required:
+        u_coefficients = [c_n * g_p, -c_n * g_n, -c_p * g_p, c_p * g_n]
+        square_coefficients["u"] = [D * c for c in u_coefficients]
+    if "w" in required:
+        w_coefficients = [-c_n * c_p, c_n * c_n, c_p * c_p, -c_p * c_n]
+        square_coefficients["w"] = [D * c for c in w_coefficients]
+    args = [images, reciprocal_coefficients, square_coefficients]
+    fields_dict = sum_images(*args, out=out, workspace=workspace, dtype=dtype)
+
+    parameters = polarized_parameters(X, Z, f_omega, alpha_omega, dtype=dtype)
+    args = [fields, parameters, fields_dict]
+    fields_dict = POLARIZED_FIELDS.resolve(*args, out=out, workspace=workspace)
+
+    if np.any(mask):
+        for key in fields_dict:
+            # Mask values below the slope
+            fields_dict[key][mask] = (1 + 1j) * np.nan
 
     return fields_dict
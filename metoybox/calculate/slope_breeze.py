@@ -2,9 +2,62 @@
 
 import numpy as np
 from typing import List
-from numpy.typing import NDArray
+from numpy.typing import NDArray, DTypeLike
 
-from metoybox.calculate.utils import recover_polarized_default
+from metoybox.calculate.dispersion import calculate_constants
+from metoybox.calculate.derived import FieldGraph
+from metoybox.calculate.workspace import Workspace, cached, grid_key, real_dtype
+from metoybox.calculate.workspace import validate
+from metoybox.calculate.utils import POLARIZED_FIELDS, polarized_parameters, coefficient
+
+SLOPE_BREEZE_FIELDS = FieldGraph(POLARIZED_FIELDS)
+
+
+@SLOPE_BREEZE_FIELDS.register("psi")
+def _psi(parameters, out=None):
+    M, B_sq = parameters["M"], parameters["B_sq"]
+    psi = np.subtract(parameters["exp_Z_sigma"], 1, out=out)
+    psi *= coefficient(parameters, M / B_sq)
+    return psi
+
+
+@SLOPE_BREEZE_FIELDS.register("u")
+def _u(parameters, out=None):
+    c = coefficient(parameters, -parameters["M"] / parameters["B_sq"])
+    return np.multiply(parameters["exp_Z_sigma"], c, out=out)
+
+
+@SLOPE_BREEZE_FIELDS.register("w")
+def _w(parameters, out=None):
+    M, B_sq = parameters["M"], parameters["B_sq"]
+    c = coefficient(parameters, -(M**2) / B_sq)
+    return np.multiply(parameters["exp_Z_sigma"], c, out=out)
+
+
+@SLOPE_BREEZE_FIELDS.register("phi", ["u"])
+def _phi(parameters, u, out=None):
+    M = parameters["M"]
+    if out is None:
+        out = np.empty(u.shape, dtype=parameters["dtype"])
+    if M == 0:
+        out.fill(0)
+        return out
+    c = 1 / M * (-parameters["sigma_hat"] - parameters["f_omega"] ** 2)
+    return np.multiply(u, coefficient(parameters, c), out=out)
+
+
+@SLOPE_BREEZE_FIELDS.register("Q")
+def _Q(parameters, out=None):
+    if out is None:
+        out = np.empty(parameters["shape"], dtype=parameters["dtype"])
+    out[...] = parameters["exp_Z_sigma"]
+    return out
+
+
+@SLOPE_BREEZE_FIELDS.register("bq")
+def _bq(parameters, out=None):
+    c = coefficient(parameters, 1 / parameters["sigma_hat"])
+    return np.multiply(parameters["exp_Z_sigma"], c, out=out)
 
 
 def calculate_fields_spatial(
@@ -15,46 +68,44 @@ def calculate_fields_spatial(
     alpha_omega: float,
     N_omega: float,
     fields: List[str] = ["psi", "u", "w", "Q"],
+    out: dict[str, NDArray] | None = None,
+    workspace: Workspace | None = None,
+    dtype: DTypeLike = complex,
 ):
     """
     Calculate the spatial structures of the solutions. The full solutions are then,
-    for instance, psi = np.real(psi_tilde * np.exp(1j * t)).
+    for instance, psi = np.real(psi_tilde * np.exp(1j * t)). X and Z may be open grids,
+    e.g. from np.meshgrid(x, z, sparse=True), or the coordinates of a list of points.
+    Values below the slope are set to nan. Fields are written in place to the arrays
+    in out where supplied, with scratch arrays taken from the workspace. The fields are
+    calculated in the complex dtype given.
     """
 
-    Z_sigma = Z - M * X
-    B_sq = -((1j + alpha_omega) ** 2) * (1 + (1 / N_omega**2) * M**2)
-    B_sq += -(f_omega**2) - M**2
-    exp_Z_sigma = np.exp(-Z_sigma)
-
-    mask = Z < M * X
-
-    fields_dict = {}
-    sigma_hat = 1j + alpha_omega
-    psi = M / B_sq * (exp_Z_sigma - 1)
-    u = -M / B_sq * exp_Z_sigma
-    w = -(M**2) / B_sq * exp_Z_sigma
-
-    fields_dict["psi"] = psi
-    fields_dict["u"] = u
-    fields_dict["w"] = w
-
-    args = [u, w, f_omega, alpha_omega, fields]
-    polarized_fields = recover_polarized_default(*args)
-    fields_dict.update(polarized_fields)
-
-    if "phi" in fields:
-        if M == 0:
-            fields_dict["phi"] = np.zeros_like(psi)
-        else:
-            fields_dict["phi"] = 1 / M * (-sigma_hat - f_omega**2) * u
-    if "Q" in fields:
-        fields_dict["Q"] = exp_Z_sigma.astype(np.complex128)
-    if "bq" in fields:
-        bq = 1 / sigma_hat * exp_Z_sigma
-        fields_dict["bq"] = bq
-
-    for key in fields_dict:
-        # Mask values below the slope
-        fields_dict[key][mask] = (1 + 1j) * np.nan
+    B_sq = calculate_constants(f_omega, alpha_omega, N_omega, M=M).B_sq
+
+    parameters = polarized_parameters(X, Z, f_omega, alpha_omega, dtype=dtype)
+    shape, real = parameters["shape"], real_dtype(dtype)
+    # The spatial structure depends only on M and the grid, with f_omega, alpha_omega
+    # and N_omega entering only through scalar prefactors, so it is kept in the
+    # workspace and reused while only those parameters change
+    key = (M, grid_key(X), grid_key(Z))
+    mask, mask_valid = cached(workspace, "shape_mask", key, shape, bool)
+    exp_Z_sigma, valid = cached(workspace, "exp_Z_sigma", key, shape, real)
+    if not (valid and mask_valid):
+        np.subtract(Z, M * X, out=exp_Z_sigma)
+        np.less(exp_Z_sigma, 0, out=mask)
+        np.negative(exp_Z_sigma, out=exp_Z_sigma)
+        np.exp(exp_Z_sigma, out=exp_Z_sigma)
+        validate(workspace, "shape_mask", key)
+        validate(workspace, "exp_Z_sigma", key)
+
+    parameters.update({"M": M, "B_sq": B_sq, "exp_Z_sigma": exp_Z_sigma})
+    args = [fields, parameters]
+    fields_dict = SLOPE_BREEZE_FIELDS.resolve(*args, out=out, workspace=workspace)
+
+    if np.any(mask):
+        for key in fields_dict:
+            # Mask values below the slope
+            fields_dict[key][mask] = (1 + 1j) * np.nan
 
     return fields_dict
@@ -0,0 +1,66 @@
+"""
+Code for evaluating fields with a reflection symmetry in x on half the grid. Where the
+forcing is symmetric about x = 0, each field is either even or odd in x, so on a grid
+symmetric about x = 0 the fields need only be calculated for x >= 0, with the other half
+then mirrored, and negated for odd fields.
+"""
+
+import numpy as np
+from typing import Callable, List
+from numpy.typing import NDArray, DTypeLike
+from metoybox.calculate.workspace import Workspace, output
+from metoybox.calculate.tiling import tile_of
+
+
+def mirror_split(x: NDArray) -> int | None:
+    """
+    Get the number of columns of the grid with x < 0 if x is symmetric about x = 0,
+    so the half x >= 0 starts at this column, or None if x is not symmetric.
+    """
+    x = np.ravel(x)
+    if x.size < 2:
+        return None
+    if np.max(np.abs(x[::-1] + x)) > 1e-9 * np.max(np.abs(x)):
+        return None
+    return x.size // 2
+
+
+def calculate_mirrored(
+    function: Callable,
+    X: NDArray,
+    Z: NDArray,
+    *args,
+    parity: dict[str, int],
+    fields: List[str] = ["psi", "u", "w"],
+    out: dict[str, NDArray] | None = None,
+    workspace: Workspace | None = None,
+    dtype: DTypeLike = complex,
+    **kwargs,
+) -> dict[str, NDArray]:
+    """
+    Evaluate function(X, Z, *args, fields=fields, **kwargs), one of the
+    calculate_fields_spatial functions. If the grid is symmetric about x = 0, the fields
+    with a parity in x, +1 for even and -1 for odd, are calculated on the half x >= 0
+    and mirrored. Other fields are calculated on the whole grid. The requested fields
+    are written to the arrays in out where supplied.
+    """
+    shape = np.broadcast_shapes(np.shape(X), np.shape(Z))
+    outputs = {name: output(out, name, shape, dtype) for name in fields}
+    split = mirror_split(np.asarray(X)[0])
+    mirrored = [name for name in fields if split is not None and name in parity]
+    unmirrored = [name for name in fields if name not in mirrored]
+    kwargs.update({"workspace": workspace, "dtype": dtype})
+
+    if mirrored:
+        # Calculate the half x >= 0 in place, then mirror it onto the half x < 0
+        half = (slice(None), slice(split, None))
+        X_half, Z_half = tile_of(X, half), tile_of(Z, half)
+        half_out = {name: outputs[name][half] for name in mirrored}
+        function(X_half, Z_half, *args, fields=mirrored, out=half_out, **kwargs)
+        columns = shape[1]
+        for name in mirrored:
+            reflected = outputs[name][:, columns - split :][:, ::-1]
+            np.multiply(reflected, parity[name], out=outputs[name][:, :split])
+    if unmirrored:
+        function(X, Z, *args, fields=unmirrored, out=outputs, **kwargs)
+    return outputs
@@ -0,0 +1,129 @@
+"""
+Code for evaluating the calculate modules over large grids in tiles. Each tile is
+calculated with its own small workspace and written directly into its block of the
+full output arrays, so peak memory is set by the tile size rather than the grid size.
+As NumPy releases the GIL inside its loops, the tiles are evaluated on a thread pool.
+"""
+
+import os
+import sys
+import threading
+import numpy as np
+from typing import Callable, List
+from numpy.typing import NDArray, DTypeLike
+from concurrent.futures import ThreadPoolExecutor
+from metoybox.calculate.workspace import Workspace, output
+
+# The approximate number of full size complex temporaries a calculation holds at once,
+# used to convert a memory budget into a tile size
+TEMPORARIES = 24
+
+
+def intermediate_itemsize(function: Callable, dtype: DTypeLike) -> int:
+    """
+    Get the size in bytes of an element of the temporaries of function, one of the
+    calculate_fields_spatial functions, calculating fields of the dtype given. Modules
+    whose temporaries are held in a fixed precision whatever the dtype of the fields
+    declare it as INTERMEDIATE_DTYPE, e.g. land_sea, which forms the exponential
+    integrals in double precision.
+    """
+    module = sys.modules.get(function.__module__)
+    intermediate = getattr(module, "INTERMEDIATE_DTYPE", dtype)
+    return max(np.dtype(dtype).itemsize, np.dtype(intermediate).itemsize)
+
+
+def tile_shape(
+    shape: tuple,
+    itemsize: int,
+    memory_budget: int,
+    workers: int,
+    temporaries: int = TEMPORARIES,
+) -> tuple[int, int]:
+    """
+    Get the largest tile shape whose temporaries, summed over the workers, fit within
+    the memory budget in bytes. Tiles are whole rows where possible, so they are
+    contiguous blocks of the outputs.
+    """
+    rows, columns = shape
+    points = memory_budget // (workers * temporaries * itemsize)
+    points = max(int(points), 1)
+    if points >= columns:
+        return min(points // columns, rows), columns
+    return 1, points
+
+
+def tiles(shape: tuple, tile: tuple[int, int]) -> list[tuple[slice, slice]]:
+    """Get the index of each tile of the given shape covering the grid."""
+    rows, columns = shape
+    tile_rows, tile_columns = tile
+    indices = []
+    for i in range(0, rows, tile_rows):
+        for j in range(0, columns, tile_columns):
+            rows_slice = slice(i, min(i + tile_rows, rows))
+            columns_slice = slice(j, min(j + tile_columns, columns))
+            indices.append((rows_slice, columns_slice))
+    return indices
+
+
+def tile_of(array: NDArray, index: tuple[slice, slice]) -> NDArray:
+    """
+    Get the block of a grid array covering a tile. Dimensions of length one, e.g. of
+    open grids from np.meshgrid(x, z, sparse=True), are kept whole so they broadcast.
+    """
+    array = np.asarray(array)
+    index = tuple(slice(None) if n == 1 else s for n, s in zip(array.shape, index))
+    return array[index]
+
+
+def calculate_tiled(
+    function: Callable,
+    X: NDArray,
+    Z: NDArray,
+    *args,
+    fields: List[str] = ["psi", "u", "w"],
+    out: dict[str, NDArray] | None = None,
+    dtype: DTypeLike = complex,
+    memory_budget: int = 256 * 2**20,
+    max_workers: int | None = None,
+    temporaries: int = TEMPORARIES,
+    **kwargs,
+) -> dict[str, NDArray]:
+    """
+    Evaluate function(X, Z, *args, fields=fields, **kwargs), one of the
+    calculate_fields_spatial functions, in tiles. The tiles are sized so the
+    temporaries of the calculations running at once fit within memory_budget bytes,
+    given the precision the temporaries are held in, and are evaluated on a pool of
+    max_workers threads, by default one per core. The requested fields are written to
+    the arrays in out where supplied.
+    """
+    shape = np.broadcast_shapes(np.shape(X), np.shape(Z))
+    outputs = {name: output(out, name, shape, dtype) for name in fields}
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    itemsize = intermediate_itemsize(function, dtype)
+    tile = tile_shape(shape, itemsize, memory_budget, max_workers, temporaries)
+    indices = tiles(shape, tile)
+
+    # Give each thread its own workspace, reused for each tile the thread evaluates
+    local = threading.local()
+
+    def evaluate(index):
+        if not hasattr(local, "workspace"):
+            local.workspace = Workspace()
+        blocks = {name: array[index] for name, array in outputs.items()}
+        X_tile, Z_tile = tile_of(X, index), tile_of(Z, index)
+        tile_kwargs = {"out": blocks, "workspace": local.workspace, "dtype": dtype}
+        result = function(X_tile, Z_tile, *args, fields=fields, **tile_kwargs, **kwargs)
+        for name, block in blocks.items():
+            # Copy any field the calculation could not write in place
+            if result[name] is not block:
+                block[...] = result[name]
+
+    workers = min(max_workers, len(indices))
+    if workers == 1:
+        for index in indices:
+            evaluate(index)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(evaluate, indices))
+    return outputs
@@ -1,24 +1,64 @@
-from typing import List
-from numpy.typing import NDArray
+import numpy as np
+from numpy.typing import NDArray, DTypeLike
+from metoybox.calculate.derived import FieldGraph
 
+# The fields given by the default polarization relations. Calculate modules extend or
+# resolve this graph, providing u and w as known values.
+POLARIZED_FIELDS = FieldGraph()
 
-def recover_polarized_default(
-    u: NDArray,
-    w: NDArray,
+
+@POLARIZED_FIELDS.register("b_w", ["w"])
+def _b_w(parameters, w, out=None):
+    return np.divide(w, coefficient(parameters, -parameters["sigma_hat"]), out=out)
+
+
+@POLARIZED_FIELDS.register("v", ["u"])
+def _v(parameters, u, out=None):
+    c = coefficient(parameters, -parameters["f_omega"] / parameters["sigma_hat"])
+    return np.multiply(u, c, out=out)
+
+
+@POLARIZED_FIELDS.register("xi", ["u"])
+def _xi(parameters, u, out=None):
+    return np.multiply(u, coefficient(parameters, -1j / parameters["sigma"]), out=out)
+
+
+@POLARIZED_FIELDS.register("zeta", ["w"])
+def _zeta(parameters, w, out=None):
+    return np.multiply(w, coefficient(parameters, -1j / parameters["sigma"]), out=out)
+
+
+@POLARIZED_FIELDS.register("zero")
+def _zero(parameters, out=None):
+    # Used as a component of vector fields with only one non-zero component
+    if out is None:
+        return np.zeros(parameters["shape"], dtype=parameters["dtype"])
+    out.fill(0)
+    return out
+
+
+def polarized_parameters(
+    X: NDArray,
+    Z: NDArray,
     f_omega: float,
     alpha_omega: float,
-    fields: List[str] = ["v", "xi", "zeta", "phi"],
     sigma: float = 1,
+    dtype: DTypeLike = complex,
 ) -> dict:
-    """Get the requisite fields from the default polarization relations."""
-    fields_dict = {}
-    sigma_hat = 1j * sigma + alpha_omega
-    fields_dict["b_w"] = -w / sigma_hat
-
-    fields_dict["v"] = -f_omega / sigma_hat * u
-    if "xi" in fields:
-        fields_dict["xi"] = -1j * u / sigma
-    if "zeta" in fields:
-        fields_dict["zeta"] = -1j * w / sigma
-    
-    return fields_dict
+    """
+    Get the parameters used to resolve POLARIZED_FIELDS on the grid X, Z, with the
+    fields calculated in the complex dtype given.
+    """
+    parameters = {"shape": np.broadcast_shapes(np.shape(X), np.shape(Z))}
+    parameters.update({"f_omega": f_omega, "sigma": sigma})
+    parameters["sigma_hat"] = 1j * sigma + alpha_omega
+    parameters["dtype"] = np.dtype(dtype)
+    return parameters
+
+
+def coefficient(parameters: dict, value: complex) -> np.generic:
+    """
+    Cast a scalar coefficient to the dtype of the fields, so multiplying a single
+    precision field by a double precision constant does not promote it.
+    """
+    return parameters["dtype"].type(value)
@@ -0,0 +1,131 @@
+"""
+Code for reusing arrays between calls to the calculate modules. Repeated updates on the
+same grid, e.g. from slider events, then fill the same arrays in place rather than
+allocating new ones.
+"""
+
+import hashlib
+from typing import Hashable
+import numpy as np
+from numpy.typing import NDArray, DTypeLike
+
+
+class Workspace:
+    """
+    A store of named arrays. An array is only reallocated if a different shape or
+    dtype is requested under the same name.
+    """
+
+    def __init__(self):
+        """Initialize an empty workspace."""
+        self.arrays: dict[str, NDArray] = {}
+        self.keys: dict[str, Hashable] = {}
+
+    def empty(self, name: str, shape: tuple, dtype: DTypeLike = complex) -> NDArray:
+        """Get the array stored under name, with unspecified contents."""
+        array = self.arrays.get(name)
+        if array is None or array.shape != shape or array.dtype != np.dtype(dtype):
+            array = np.empty(shape, dtype=dtype)
+            self.arrays[name] = array
+        return array
+
+    def cached(
+        self, name: str, key: Hashable, shape: tuple, dtype: DTypeLike = complex
+    ) -> tuple[NDArray, bool]:
+        """
+        Get the array stored under name, and whether its contents are still valid, i.e.
+        it was last filled for the same key. If not, the caller should fill the array
+        then call validate, so an array left partly filled, e.g. by an exception, is
+        never taken as valid.
+        """
+        array = self.arrays.get(name)
+        valid = array is not None and array.shape == shape
+        valid = valid and array.dtype == np.dtype(dtype) and self.keys.get(name) == key
+        if not valid:
+            self.keys.pop(name, None)
+        return self.empty(name, shape, dtype), valid
+
+    def validate(self, name: str, key: Hashable):
+        """Record that the array stored under name has been filled for key."""
+        self.keys[name] = key
+
+    def nbytes(self) -> int:
+        """Get the total size of the stored arrays in bytes."""
+        return sum(array.nbytes for array in self.arrays.values())
+
+
+def real_dtype(dtype: DTypeLike) -> np.dtype:
+    """Get the real dtype with the same precision as the complex dtype given."""
+    return np.finfo(dtype).dtype
+
+
+def grid_key(array: NDArray) -> tuple:
+    """
+    Get a key identifying a grid array by its contents, shape and dtype, for keying
+    cached arrays calculated from it. Keying on the contents rather than the memory
+    means a new grid that reuses the memory of an old one is never mistaken for it.
+    """
+    array = np.ascontiguousarray(array)
+    return (hashlib.sha1(array.data).hexdigest(), array.shape, array.dtype.str)
+
+
+def cached(
+    workspace: Workspace | None,
+    name: str,
+    key: Hashable,
+    shape: tuple,
+    dtype: DTypeLike = complex,
+) -> tuple[NDArray, bool]:
+    """
+    Get a cached array from the workspace and whether it is valid for key, or a new
+    array, which is never valid, if there is no workspace.
+    """
+    if workspace is None:
+        return np.empty(shape, dtype=dtype), False
+    return workspace.cached(name, key, shape, dtype)
+
+
+def validate(workspace: Workspace | None, name: str, key: Hashable):
+    """Record that a cached array has been filled for key, if there is a workspace."""
+    if workspace is not None:
+        workspace.validate(name, key)
+
+
+def scratch(
+    workspace: Workspace | None, name: str, shape: tuple, dtype: DTypeLike = complex
+) -> NDArray:
+    """Get a scratch array from the workspace, or a new array if there is none."""
+    if workspace is None:
+        return np.empty(shape, dtype=dtype)
+    return workspace.empty(name, shape, dtype)
+
+
+def output(
+    out: dict[str, NDArray] | None, name: str, shape: tuple, dtype: DTypeLike = complex
+) -> NDArray:
+    """
+    Get the caller-supplied output array for name, or a new array if none was supplied
+    with the right shape and dtype. The contents are unspecified.
+    """
+    if out is not None and name in out:
+        array = out[name]
+        if array.shape == shape and array.dtype == np.dtype(dtype):
+            return array
+    return np.empty(shape, dtype=dtype)
+
+
+def targets(
+    out: dict[str, NDArray] | None,
+    workspace: Workspace | None,
+    intermediates: set[str],
+    shape: tuple,
+    dtype: DTypeLike = complex,
+) -> dict[str, NDArray]:
+    """
+    Get the arrays a calculation writes its fields to, i.e. the caller-supplied arrays
+    in out, plus workspace arrays for the intermediate fields the caller did not request.
+    """
+    arrays = dict(out) if out is not None else {}
+    for name in intermediates:
+        arrays[name] = scratch(workspace, "intermediate_" + name, shape, dtype)
+    return arrays
@@ -0,0 +1,57 @@
+"""
+Code for caching calculated fields between updates. The sliders quantize the variables
+to their steps, so revisiting a state, e.g. by dragging a slider back and forth, can
+reuse the fields calculated for it rather than calling the calculate modules again.
+Fields can also be cached on disk with metoybox.calculate.cache, so they are reused
+across sessions.
+"""
+
+from collections import OrderedDict
+from typing import Hashable
+from numpy.typing import NDArray
+
+
+class FieldCache:
+    """
+    A least recently used cache of field arrays, holding at most max_bytes of arrays.
+    The cache stores copies, so the arrays put in may be overwritten afterwards, e.g. the
+    output buffers of the models. Arrays got from the cache should not be modified.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2**20):
+        """Initialize an empty cache."""
+        self.entries: OrderedDict[Hashable, NDArray] = OrderedDict()
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+
+    def get(self, key: Hashable) -> NDArray | None:
+        """Get the array stored under key, or None if there is none."""
+        array = self.entries.get(key)
+        if array is not None:
+            self.entries.move_to_end(key)
+        return array
+
+    def put(self, key: Hashable, array: NDArray):
+        """
+        Store a copy of array under key, evicting the least recently used arrays until
+        the cache is within budget. Arrays larger than the whole budget are not stored.
+        """
+        self.pop(key)
+        if array.nbytes > self.max_bytes:
+            return
+        while self.entries and self.nbytes + array.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+        self.entries[key] = array.copy()
+        self.nbytes += array.nbytes
+
+    def pop(self, key: Hashable):
+        """Remove the array stored under key, if any."""
+        array = self.entries.pop(key, None)
+        if array is not None:
+            self.nbytes -= array.nbytes
+
+    def clear(self):
+        """Remove all stored arrays."""
+        self.entries.clear()
+        self.nbytes = 0
@@ -4,6 +4,7 @@ but lets try to write these classes in a deployment agnostic way. We will then b
 separate pyscript and native plt implementations.
 """
 
+import hashlib
 import numpy as np
 from numpy.typing import NDArray
 import matplotlib.pyplot as plt
@@ -11,8 +12,22 @@ import matplotlib.colors as mcolors
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 from typing import Literal, Callable
 from dataclasses import dataclass
+from metoybox.calculate.workspace import Workspace, real_dtype
+from metoybox.calculate.tiling import tiles
+from metoybox.calculate.cache import DiskFieldCache
+from metoybox.model.cache import FieldCache
 
 CoordinateOptions = Literal["dimensional", "non-dimensional"]
+PrecisionOptions = Literal["double", "single"]
+complex_dtypes = {"double": np.complex128, "single": np.complex64}
+# The fraction by which the quiver magnitude must fall below the lower bound of its
+# scale before the scale is reduced, so the scale does not flip back and forth when the
+# magnitude is near a boundary
+QUIVER_HYSTERESIS = 0.2
+
+# The rows of the grid calculated per step when prefetching fields, which bounds the
+# time a step holds up the handling of events
+PREFETCH_TILE_ROWS = 16
 
 
 def get_default_scalings(
@@ -219,7 +234,9 @@ class ScalarField(BaseField):
 
 class VectorField(BaseField):
     """
-    Class to manage the properties of vector fields we need for visualization.
+    Class to manage the properties of vector fields we need for visualization. The
+    components are requested by name, so any field in the calculate module's field
+    graph, e.g. "zero", can be used as a component.
     """
 
     def __init__(
@@ -393,7 +410,11 @@ default_non_dimensional.update({"sigma": 1.0, "k": np.pi})
 
 
 class DisplacementLines:
-    """Convenience class to cleanly manage lists of displacement lines."""
+    """
+    Convenience class to cleanly manage the displacement lines. The lines are drawn as a
+    single Line2D, with a nan vertex separating each line from the next, so all the
+    lines are updated together by vectorized operations on one vertex array.
+    """
 
     def __init__(self, z, number_lines=8, fields=["xi", "zeta"], max_upper_scale=1.5):
         """Initialize the displacement lines."""
@@ -402,14 +423,48 @@ class DisplacementLines:
         self.base_heights = z[self.subset]
         dz = self.base_heights[1] - self.base_heights[0]
         self.max_upper = max_upper_scale * dz
-        self.lines: list[plt.Line2D] = []
+        self.line: plt.Line2D | None = None
+        # The x and z coordinates of the vertices of each line, with a final nan column
+        self.vertices: NDArray | None = None
         self.visible: bool = False
         self.fields = fields
+        # The displacement fields on the rows of the lines only
+        self.data: dict[str, NDArray] = {}
+
+    def initialize(self, ax, x, **kwargs):
+        """Plot the undisplaced lines on ax, marking every 2 * step points."""
+        shape = (len(self.base_heights), len(x) + 1)
+        self.vertices = np.full((2,) + shape, np.nan)
+        self.x_data[:] = x
+        self.z_data[:] = self.base_heights[:, None]
+        markers = np.zeros(shape, dtype=bool)
+        markers[:, : len(x) : 2 * self.step] = True
+        kwargs["markevery"] = markers.ravel()
+        self.line = ax.plot(*self.vertices.reshape(2, -1), **kwargs)[0]
+        self.set_visibility()
+
+    @property
+    def x_data(self) -> NDArray:
+        """The x coordinates of each line, as a view of the vertices."""
+        return self.vertices[0, :, :-1]
+
+    @property
+    def z_data(self) -> NDArray:
+        """The z coordinates of each line, as a view of the vertices."""
+        return self.vertices[1, :, :-1]
+
+    def get_data(self) -> NDArray:
+        """Get the vertices of each line, with shape (lines, points, 2)."""
+        return np.stack([self.x_data, self.z_data], axis=-1)
+
+    def update_line(self):
+        """Update the plotted line from the vertices."""
+        self.line.set_data(*self.vertices.reshape(2, -1))
 
     def set_visibility(self):
         """Set the visibility of all lines."""
-        for line in self.lines:
-            line.set_visible(self.visible)
+        if self.line is not None:
+            self.line.set_visible(self.visible)
 
 
 class BaseWaveModel:
@@ -418,6 +473,11 @@ class BaseWaveModel:
     each field is saved, with the overall field then np.real(Field * exp(i*t)).
     """
 
+    # The non-dimensional variables calculate_fields depends on, declared by subclasses
+    # so variables that only change the scalings, e.g. Q_0, do not recalculate fields.
+    # None means the fields are recalculated for any change.
+    field_variables: tuple[str, ...] | None = None
+
     def __init__(
         self,
         name: str,
@@ -441,8 +501,16 @@ class BaseWaveModel:
         match_non_dimensional: MatchVariablesFunction = match_non_dimensional,
         scalings: dict[str, float] | None = None,
         max_upper_scale: float = 1.5,
+        precision: PrecisionOptions = "double",
+        field_cache_bytes: int = 64 * 2**20,
+        field_cache_directory: str | None = None,
     ):
-        """Initialize the model."""
+        """
+        Initialize the model. With precision "single" the fields are calculated, stored
+        and evaluated in time in single precision, halving their memory and bandwidth.
+        Calculated fields are cached for revisited states, in at most field_cache_bytes,
+        and also on disk in field_cache_directory if given.
+        """
         self.name = name
         self.fig: plt.Figure = None
         self.ax: plt.Axes = None
@@ -459,13 +527,19 @@ class BaseWaveModel:
         self.x_limits, self.z_limits = x_limits, z_limits
         self.x_unit_formatter = x_unit_formatter
         self.z_unit_formatter = z_unit_formatter
-        self.X, self.Z = np.meshgrid(x, z)
+        # Use open grids, i.e. X a row and Z a column, and let the calculations
+        # broadcast them only when combining terms into the final fields
+        self.X, self.Z = np.meshgrid(x, z, sparse=True)
         self.fields = fields
         self.active_imshow_field = active_imshow_field
         self.active_quiver_field = active_quiver_field
         self.imshow, self.quiver, self.contour = None, None, None
         self.quiver_key, self.colorbar_ax, self.colorbar = None, None, None
         self.quiver_key_label = ""
+        # The inputs each label-like artist was last set from, e.g. its text
+        self.rendered: dict[str, object] = {}
+        # The values of the field_variables the fields were last calculated with
+        self.field_inputs: dict[str, float] | None = None
         self.quiver_visible = False
         self.imshow_visible = False
         # Choose quiver steps so we get approx 10 arrows in each direction
@@ -486,6 +560,39 @@ class BaseWaveModel:
         dim, non_dim = self.dimensional_variables, self.non_dimensional_variables
         self.scalings = self.get_scalings(coord, dim, non_dim)
         self.displacement_lines = DisplacementLines(z, max_upper_scale=max_upper_scale)
+        # The rows and columns of the grid each figure element is drawn from, so the
+        # quiver and displacement fields are only calculated where they are drawn
+        self.grids = {"full": (slice(None), slice(None)), "quiver": self.quiver_subset}
+        self.grids["lines"] = (self.displacement_lines.subset, slice(None))
+        # Arrays reused between updates, so steady state slider events calculate the
+        # fields in place rather than allocating new arrays
+        self.field_buffers = Workspace()
+        self.workspace = Workspace()
+        # Separate workspaces for the smaller grids, so their scratch arrays do not
+        # displace those of the full grid
+        self.grid_workspaces = {"quiver": Workspace(), "lines": Workspace()}
+        # The tile of rows fields are being prefetched on, see prefetch_fields
+        self.grids["prefetch"] = self.grids["full"]
+        self.grid_workspaces["prefetch"] = Workspace()
+        # The real and imaginary parts of the displayed fields, and the buffers they
+        # are evaluated in time into, so time updates need no complex arithmetic
+        self.phase_planes = Workspace()
+        self.time_buffers = Workspace()
+        self.precision = precision
+        self.dtype = np.dtype(complex_dtypes[precision])
+        # Fields calculated for previous values of the field_variables
+        self.field_cache = FieldCache(field_cache_bytes)
+        self.disk_field_cache = None
+        if field_cache_directory is not None:
+            self.disk_field_cache = DiskFieldCache(field_cache_directory)
+        # Identify the grids by their coordinates, so fields cached on disk are only
+        # reused for the same grid
+        self.grid_digests = {}
+        for grid, (rows, columns) in self.grids.items():
+            coordinates = (
+                np.asarray(x)[columns].tobytes() + np.asarray(z)[rows].tobytes()
+            )
+            self.grid_digests[grid] = hashlib.sha256(coordinates).hexdigest()
 
     def initialize_figure(self):
         """Initialize the figure with the fields."""
@@ -501,8 +608,9 @@ class BaseWaveModel:
 
         # Initialize the figure, axes and layout
         self.fig, self.ax = plt.subplots(1, 1, figsize=self.figure_size)
+        self.rendered = {}
         # self.fig.patch.set_facecolor("#E6E6E6")
-        self.X, self.Z = np.meshgrid(self.x, self.z)
+        self.X, self.Z = np.meshgrid(self.x, self.z, sparse=True)
         self.ax.set_ylim(self.z_limits)
         self.ax.set_xlim(self.x_limits)
         if self.x_ticks is None:
@@ -526,7 +634,7 @@ class BaseWaveModel:
         extent = [self.x.min(), self.x.max(), self.z.min(), self.z.max()]
         kwargs.update({"extent": extent, "norm": field.norm})
         kwargs.update({"rasterized": True})
-        dummy_data = (np.ones_like(self.Z) * np.nan).astype(np.float64)
+        dummy_data = np.full((len(self.z), len(self.x)), np.nan, dtype=np.float64)
         self.imshow = self.ax.imshow(dummy_data, **kwargs)
         divider = make_axes_locatable(self.ax)
         self.colorbar_ax = divider.append_axes("right", size="5.5%", pad=0.25)
@@ -543,7 +651,7 @@ class BaseWaveModel:
         field = self.fields[self.active_quiver_field]
         quiver_scale = field.quiver_scale
         subset = self.quiver_subset
-        args = [self.X[subset], self.Z[subset]]
+        args = [self.x[subset[1]], self.z[subset[0]]]
         args += [dummy_data[subset], dummy_data[subset]]
         kwargs = {"color": "k", "scale": quiver_scale, "width": 0.006}
         kwargs.update({"angles": "xy", "zorder": 2, "rasterized": True})
@@ -555,12 +663,8 @@ class BaseWaveModel:
 
         # Initialize the displacements
         kwargs = {"color": "k", "linewidth": 1.0, "zorder": 1, "markersize": 4}
-        kwargs.update({"markevery": 2 * self.displacement_lines.step})
         kwargs.update({"rasterized": True, "color": "#333333", "marker": "s"})
-        for height in self.displacement_lines.base_heights:
-            line = self.ax.plot(self.x, np.ones_like(self.x) * height, **kwargs)[0]
-            self.displacement_lines.lines.append(line)
-        self.displacement_lines.set_visibility()
+        self.displacement_lines.initialize(self.ax, self.x, **kwargs)
 
         # Finalize
         self.fig.suptitle("placeholder", y=self.suptitle_height)
@@ -585,6 +689,17 @@ class BaseWaveModel:
         # to avoid repeating the check every time we update the variables.
         self.non_dimensional_variables.update(new_variables)
 
+    def changed(self, artist, inputs):
+        """
+        Check whether the inputs the artist named was last set from have changed, and
+        record the new inputs. Setting an artist forces matplotlib to lay it out and
+        render it again, e.g. with mathtext, so artists are only set when this is True.
+        """
+        if artist in self.rendered and self.rendered[artist] == inputs:
+            return False
+        self.rendered[artist] = inputs
+        return True
+
     def match_variables(self):
         """Ensure the variables of both coordinate systems are consistent."""
         dim_var = self.dimensional_variables
@@ -596,6 +711,25 @@ class BaseWaveModel:
             new_var = self.match_non_dimensional(dim_var, non_dim_var)
             self.dimensional_variables = new_var
 
+    def get_field_inputs(self):
+        """Get the current values of the variables the fields depend on."""
+        if self.field_variables is None:
+            return None
+        variables = self.non_dimensional_variables
+        return {name: variables[name] for name in self.field_variables}
+
+    def fields_invalidated(self):
+        """
+        Match the variables of the two coordinate systems, then check whether the fields
+        need recalculating, i.e. whether any of the field_variables changed since the
+        fields were last calculated.
+        """
+        self.match_variables()
+        inputs = self.get_field_inputs()
+        return (
+            inputs is None or self.field_inputs is None or inputs != self.field_inputs
+        )
+
     def update_suptitle(self, hour_offset=12):
         """Update the figure suptitle."""
         if self.coordinates == "dimensional":
@@ -606,10 +740,12 @@ class BaseWaveModel:
             minute = int(np.floor((t_dim - hour * 3600) / 60))
             second = int(np.round(t_dim - hour * 3600 - minute * 60))
             time_str = f"{hour_LST:02d}:{minute:02d}:{second:02d}"
-            self.fig.suptitle(rf"{time_str} [LST]", y=self.suptitle_height)
+            suptitle = rf"{time_str} [LST]"
         else:
             t = self.non_dimensional_variables["t"]
-            self.fig.suptitle(rf"$t={t:.2f}$ [-]", y=self.suptitle_height)
+            suptitle = rf"$t={t:.2f}$ [-]"
+        if self.changed("suptitle", suptitle):
+            self.fig.suptitle(suptitle, y=self.suptitle_height)
 
     def update_quiver_key_label(self):
         """Get the quiver key label for the appropriate coordinate system."""
@@ -651,7 +787,13 @@ class BaseWaveModel:
             mag = self.fields[self.active_quiver_field].quiver_key_magnitude
             quiver_key_label = rf"{format_mag(mag)} [-]"
         self.quiver_key_label = quiver_key_label
-        self.quiver_key.text.set_text(self.quiver_key_label)
+        self.set_quiver_key_text()
+
+    def set_quiver_key_text(self):
+        """Set the quiver key text to the current label, if it has changed."""
+        if self.changed("quiver_key", self.quiver_key_label):
+            self.quiver_key.label = self.quiver_key_label
+            self.quiver_key.text.set_text(self.quiver_key_label)
 
     def update_colorbar_labels(self):
         """Update the colorbar labels based on active coordinate system."""
@@ -692,8 +834,10 @@ class BaseWaveModel:
             cbar_tick_lab, cbar_axis_label = format_labels(*args)
 
         cbar_tick_lab = [f"{val:.2f}" for val in cbar_tick_lab]
-        self.colorbar.set_ticklabels(cbar_tick_lab)
-        self.colorbar.set_label(cbar_axis_label)
+        if self.changed("colorbar_ticks", cbar_tick_lab):
+            self.colorbar.set_ticklabels(cbar_tick_lab)
+        if self.changed("colorbar_label", cbar_axis_label):
+            self.colorbar.set_label(cbar_axis_label)
 
     def update_labels(self):
         """
@@ -727,10 +871,14 @@ class BaseWaveModel:
 
         self.update_quiver_key_label()
         self.update_colorbar_labels()
-        self.ax.set_xticklabels(x_tick_lab)
-        self.ax.set_yticklabels(z_tick_lab)
-        self.ax.set_xlabel(x_axis_lab)
-        self.ax.set_ylabel(z_axis_lab)
+        if self.changed("x_ticks", list(x_tick_lab)):
+            self.ax.set_xticklabels(x_tick_lab)
+        if self.changed("z_ticks", list(z_tick_lab)):
+            self.ax.set_yticklabels(z_tick_lab)
+        if self.changed("x_label", x_axis_lab):
+            self.ax.set_xlabel(x_axis_lab)
+        if self.changed("z_label", z_axis_lab):
+            self.ax.set_ylabel(z_axis_lab)
 
     def update_figure_data(self):
         """Update the figure data based on the current fields and time."""
@@ -743,25 +891,66 @@ class BaseWaveModel:
             t = self.non_dimensional_variables["t"]
             sigma = self.non_dimensional_variables["sigma"]
 
+        # Cast the phase so single precision fields are not promoted
+        phase = self.dtype.type(np.exp(1j * sigma * t))
         imshow_field = self.fields[self.active_imshow_field]
-        imshow_data = np.real(imshow_field.field * np.exp(1j * sigma * t))
+        args = [self.active_imshow_field, imshow_field.field, phase]
+        imshow_data = self.evaluate_in_time(*args, "imshow")
         self.imshow.set_data(imshow_data)
 
         quiver_field = self.fields[self.active_quiver_field]
         component_fields = quiver_field.fields
         keys = list(component_fields.keys())
-        field_1 = np.real(component_fields[keys[0]].field * np.exp(1j * sigma * t))
-        field_2 = np.real(component_fields[keys[1]].field * np.exp(1j * sigma * t))
+        args = [keys[0], component_fields[keys[0]].field, phase]
+        field_1 = self.evaluate_in_time(*args, "quiver_1", "quiver_")
+        args = [keys[1], component_fields[keys[1]].field, phase]
+        field_2 = self.evaluate_in_time(*args, "quiver_2", "quiver_")
         # Mask out arrows larger than max_upper
-        magnitude = np.sqrt(field_1**2 + field_2**2)
-        field_1[magnitude > quiver_field.max_upper] = np.nan
-        field_2[magnitude > quiver_field.max_upper] = np.nan
-        subset = self.quiver_subset
-        self.quiver.set_UVC(field_1[subset], field_2[subset])
+        magnitude = self.time_buffers.empty("magnitude", field_1.shape, field_1.dtype)
+        np.hypot(field_1, field_2, out=magnitude)
+        mask = self.time_buffers.empty("mask", magnitude.shape, bool)
+        np.greater(magnitude, quiver_field.max_upper, out=mask)
+        field_1[mask] = np.nan
+        field_2[mask] = np.nan
+        self.quiver.set_UVC(field_1, field_2)
 
         if self.displacement_lines.visible:
             self.update_displacement_lines()
 
+    def update_phase_planes(self, names, new_fields, prefix=""):
+        """
+        Store the real and imaginary parts of the fields named as separate real arrays,
+        under the field names with the prefix given, so the fields can be evaluated in
+        time without complex arithmetic.
+        """
+        real = real_dtype(self.dtype)
+        for name in names:
+            field = new_fields[name]
+            key = prefix + name
+            real_plane = self.phase_planes.empty(key + "_real", field.shape, real)
+            imag_plane = self.phase_planes.empty(key + "_imag", field.shape, real)
+            np.copyto(real_plane, field.real)
+            np.copyto(imag_plane, field.imag)
+
+    def evaluate_in_time(self, name, field, phase, buffer_name, prefix=""):
+        """
+        Get np.real(field * phase) from the stored real and imaginary parts of the field
+        name, i.e. real * cos - imag * sin, in the reused buffer buffer_name. The parts are
+        first stored from field if absent.
+        """
+        key = prefix + name
+        if key + "_real" not in self.phase_planes.arrays:
+            self.update_phase_planes([name], {name: field}, prefix=prefix)
+        real_plane = self.phase_planes.arrays[key + "_real"]
+        imag_plane = self.phase_planes.arrays[key + "_imag"]
+        shape, dtype = real_plane.shape, real_plane.dtype
+        data = self.time_buffers.empty(buffer_name, shape, dtype)
+        temporary = self.time_buffers.empty(buffer_name + "_temporary", shape, dtype)
+        np.multiply(real_plane, phase.real, out=data)
+        np.multiply(imag_plane, -phase.imag, out=temporary)
+        data += temporary
+        return data
+
     def get_active_fields(self):
         """Return all the active scalars fields. Typically used for updating."""
         names = [self.active_imshow_field]
@@ -770,20 +959,145 @@ class BaseWaveModel:
         names += components
         return names
 
-    def calculate_fields(self, fields):
-        """Calculate the model fields in non-dimensional units."""
+    def get_grid(self, grid="full"):
+        """Get the open grid X, Z of the rows and columns of the grid named."""
+        rows, columns = self.grids[grid]
+        return self.X[:, columns], self.Z[rows, :]
+
+    def get_workspace(self, grid="full"):
+        """Get the workspace for calculations on the grid named."""
+        return self.workspace if grid == "full" else self.grid_workspaces[grid]
+
+    def get_output_buffers(self, names, grid="full"):
+        """Get the arrays the fields named in names are calculated into on the grid."""
+        rows, columns = self.grids[grid]
+        shape = (len(self.z[rows]), len(self.x[columns]))
+        prefix = "" if grid == "full" else grid + "_"
+        buffers = self.field_buffers
+        return {name: buffers.empty(prefix + name, shape, self.dtype) for name in names}
+
+    def calculate_fields(self, fields, grid="full"):
+        """
+        Calculate the model fields in non-dimensional units, on the grid named in
+        self.grids.
+        """
         # This method should be implemented in subclasses
         message = "calculate_fields is model specific and should be implemented in "
         message += "subclasses."
         raise NotImplementedError(message)
 
+    def get_field_cache_keys(self, fields, grid="full"):
+        """
+        Get the keys the fields named on the grid named are cached under for the
+        current field inputs, or None for models without field_variables.
+        """
+        if self.field_inputs is None:
+            return None
+        model = f"{type(self).__module__}.{type(self).__qualname__}"
+        inputs = tuple(sorted(self.field_inputs.items()))
+        digest, dtype = self.grid_digests[grid], self.dtype.str
+        return {name: (model, inputs, digest, dtype, name) for name in fields}
+
+    def get_cached_field(self, key):
+        """
+        Get the field cached under key, from memory or else from disk, or None if it is
+        not cached.
+        """
+        field = self.field_cache.get(key)
+        if field is None and self.disk_field_cache is not None:
+            field = self.disk_field_cache.get(key)
+            if field is not None:
+                self.field_cache.put(key, field)
+        return field
+
+    def cache_field(self, key, field):
+        """Cache a copy of field under key, in memory and on disk if enabled."""
+        self.field_cache.put(key, field)
+        if self.disk_field_cache is not None:
+            self.disk_field_cache.put(key, field)
+
+    def calculate_cached_fields(self, fields, grid="full"):
+        """
+        Get the fields named on the grid named, from the field caches where they were
+        calculated before for the current field inputs, calculating and caching the rest.
+        Fields of models without field_variables are always calculated.
+        """
+        keys = self.get_field_cache_keys(fields, grid)
+        if keys is None:
+            return self.calculate_fields(fields, grid)
+        cached = {name: self.get_cached_field(keys[name]) for name in fields}
+        missing = [name for name in fields if cached[name] is None]
+        if not missing:
+            return cached
+        new_fields = self.calculate_fields(missing, grid)
+        for name in missing:
+            self.cache_field(keys[name], new_fields[name])
+        return {name: new_fields.get(name, cached[name]) for name in fields}
+
+    def with_variables(self, variables, function, *args):
+        """
+        Call function(*args) with the variables given, in the current coordinates,
+        replacing the current values, then restore the current state.
+        """
+        state = [self.dimensional_variables, self.non_dimensional_variables]
+        state.append(self.field_inputs)
+        try:
+            # Copy the variables, as matching them updates them in place
+            self.dimensional_variables = self.dimensional_variables.copy()
+            self.non_dimensional_variables = self.non_dimensional_variables.copy()
+            if self.coordinates == "dimensional":
+                self.dimensional_variables.update(variables or {})
+            else:
+                self.non_dimensional_variables.update(variables or {})
+            self.match_variables()
+            self.field_inputs = self.get_field_inputs()
+            return function(*args)
+        finally:
+            self.dimensional_variables, self.non_dimensional_variables = state[:2]
+            self.field_inputs = state[2]
+
+    def prefetch_fields(
+        self, fields, grid="full", variables=None, tile_rows=PREFETCH_TILE_ROWS
+    ):
+        """
+        Calculate and cache the fields named on the grid named for a likely next state,
+        without changing the state or the displayed fields. The variables given, in the
+        current coordinates, replace the current values. This is a generator, which
+        calculates one tile of tile_rows rows of the grid per step, so the work can be
+        done between events in short steps, and abandoned by no longer stepping. The
+        fields are cached once the last tile is done.
+        """
+        keys = self.with_variables(variables, self.get_field_cache_keys, fields, grid)
+        if keys is None:
+            # The fields could not be reused, so there is nothing to gain
+            return
+        missing = [name for name in fields if self.get_cached_field(keys[name]) is None]
+        if not missing:
+            return
+        rows, columns = self.grids[grid]
+        rows, columns = range(len(self.z))[rows], range(len(self.x))[columns]
+        shape = (len(rows), len(columns))
+        prefetched = {name: np.empty(shape, self.dtype) for name in missing}
+        for tile, _ in tiles(shape, (tile_rows, shape[1])):
+            tile_range = rows[tile]
+            tile_slice = slice(tile_range.start, tile_range.stop, tile_range.step)
+            self.grids["prefetch"] = (tile_slice, self.grids[grid][1])
+            args = [variables, self.calculate_fields, missing, "prefetch"]
+            tile_fields = self.with_variables(*args)
+            for name in missing:
+                prefetched[name][tile] = tile_fields[name]
+            yield
+        for name in missing:
+            self.cache_field(keys[name], prefetched[name])
+
     def update_displacement_lines(self):
         """Update the displacement lines based on the current displacement fields."""
 
         x, z = self.x, self.z
         disp_lines = self.displacement_lines
-        xi = self.fields[disp_lines.fields[0]].field[disp_lines.subset, :]
-        zeta = self.fields[disp_lines.fields[1]].field[disp_lines.subset, :]
+        xi_name, zeta_name = disp_lines.fields
+        xi_tilde = disp_lines.data[xi_name]
+        zeta_tilde = disp_lines.data[zeta_name]
         z = z[disp_lines.subset]
         t = self.non_dimensional_variables["t"]
         sigma = self.non_dimensional_variables["sigma"]
@@ -797,47 +1111,50 @@ class BaseWaveModel:
         # because we always create our figures in non-dimensional coords, then just
         # adjust labels, we also need to rescale xi and zeta back from (x_*, z_*) to
         # (x, z)! This is all very annoying and confusing.
+        xi_scale, zeta_scale = 1, 1
         if self.coordinates == "dimensional":
-            xi = xi * self.scalings["xi"] / self.scalings["x"]
-            zeta = zeta * self.scalings["zeta"] / self.scalings["z"]
+            xi_scale = self.scalings["xi"] / self.scalings["x"]
+            zeta_scale = self.scalings["zeta"] / self.scalings["z"]
 
         # Get the magnitudes after rescaling
-        xi_mag = np.abs(xi)
-        zeta_mag = np.abs(zeta)
-
-        # Now get the time-dependent real parts
-        xi = np.real(xi * np.exp(1j * sigma * t))
-        zeta = np.real(zeta * np.exp(1j * sigma * t))
-
-        for i, line in enumerate(disp_lines.lines):
-            zeta_i = zeta_mag[i, :]
-            xi_i = xi_mag[i, :]
-            # If any part of the displacement is too big, set the whole line to nan
-            cond_1 = np.any(np.abs(zeta_i) > disp_lines.max_upper)
-            cond_2 = np.any(np.abs(xi_i) > disp_lines.max_upper)
-            if cond_1 or cond_2:
-                zeta[i, :] = np.nan
-                xi[i, :] = np.nan
-            line.set_xdata(x + xi[i, :])
-            line.set_ydata(z[i] + zeta[i, :])
+        xi_mag = np.abs(xi_tilde) * abs(xi_scale)
+        zeta_mag = np.abs(zeta_tilde) * abs(zeta_scale)
+
+        # Now get the time-dependent real parts, from the stored real and imaginary parts
+        phase = self.dtype.type(np.exp(1j * sigma * t))
+        xi = self.evaluate_in_time(xi_name, xi_tilde, phase, "xi", "lines_")
+        zeta = self.evaluate_in_time(zeta_name, zeta_tilde, phase, "zeta", "lines_")
+        xi *= xi_scale
+        zeta *= zeta_scale
+
+        np.add(x, xi, out=disp_lines.x_data)
+        np.add(z[:, None], zeta, out=disp_lines.z_data)
+        # If any part of a line's displacement is too big, set the whole line to nan
+        too_big = np.any(zeta_mag > disp_lines.max_upper, axis=1)
+        too_big |= np.any(xi_mag > disp_lines.max_upper, axis=1)
+        disp_lines.x_data[too_big] = np.nan
+        disp_lines.z_data[too_big] = np.nan
+        disp_lines.update_line()
 
     def update_fields(self, force_update_norm=False):
         """Update the fields and the requisite figure elements."""
 
         # Update imshow field
-        names = self.get_active_fields()
-        names += self.displacement_lines.fields
         self.match_variables()
-        new_fields = self.calculate_fields(names)
+        self.field_inputs = self.get_field_inputs()
         name = self.active_imshow_field
+        new_fields = self.calculate_cached_fields([name])
+        # Store the parts of the displayed fields for evaluating them in time
+        self.update_phase_planes([name], new_fields)
         self.fields[name].field = new_fields[name]
         percentile = self.fields[name].percentile
+        max_upper = self.fields[name].max_upper
+        max_lower = self.fields[name].max_lower
         if percentile is not None:
-            current_max = np.nanpercentile(np.abs(new_fields[name]), percentile)
+            args = [new_fields[name], percentile, max_lower, max_upper]
+            current_max = scale_percentile(*args)
         else:
             current_max = np.nanmax(np.abs(new_fields[name]))
-        max_upper = self.fields[name].max_upper
-        max_lower = self.fields[name].max_lower
         cond = current_max > max_upper or current_max < max_lower
         if cond or force_update_norm:
             # Reset max_upper and max_lower
@@ -858,31 +1175,35 @@ class BaseWaveModel:
             # Update the imshow with new norm
             self.imshow.norm = field.norm
             self.colorbar.update_normal(self.imshow)
-            # Update the ticks after change of normal
+            # Update the ticks after change of normal, which resets the tick labels
             self.colorbar.set_ticks(tick_labels)
+            self.rendered.pop("colorbar_ticks", None)
             self.update_colorbar_labels()
 
-        # Update displacement line fields
-        if self.displacement_lines.visible:
-            disp_field_names = self.displacement_lines.fields
-            for name in disp_field_names:
-                self.fields[name].field = new_fields[name]
+        # Update displacement line fields, calculated on the rows of the lines only
+        lines = self.displacement_lines
+        if lines.visible:
+            lines.data = self.calculate_cached_fields(lines.fields, "lines")
+            self.update_phase_planes(lines.fields, lines.data, "lines_")
 
-        # Update quiver field
+        # Update quiver field, calculated on the points of the arrows only. The quiver
+        # scale is then estimated from the arrows too.
         name = self.active_quiver_field
         quiv_names = list(self.fields[name].fields.keys())
+        new_fields = self.calculate_cached_fields(quiv_names, "quiver")
+        self.update_phase_planes(quiv_names, new_fields, "quiver_")
         new_comp_1 = new_fields[quiv_names[0]]
         new_comp_2 = new_fields[quiv_names[1]]
         self.fields[name].fields[quiv_names[0]].field = new_comp_1
         self.fields[name].fields[quiv_names[1]].field = new_comp_2
         magnitude = np.sqrt(np.abs(new_comp_1) ** 2 + np.abs(new_comp_2) ** 2)
         percentile = self.fields[name].percentile
+        max_upper = self.fields[name].max_upper
+        max_lower = self.fields[name].max_lower * (1 - QUIVER_HYSTERESIS)
         if percentile is not None:
-            current_max = np.nanpercentile(magnitude, 90)
+            current_max = scale_percentile(magnitude, 90, max_lower, max_upper)
         else:
             current_max = np.nanmax(magnitude)
-        max_upper = self.fields[name].max_upper
-        max_lower = self.fields[name].max_lower
 
         cond = current_max > max_upper or current_max < max_lower
         if cond or force_update_norm:
@@ -893,38 +1214,31 @@ class BaseWaveModel:
             max_spacing = np.max([self.quiver_width_x, self.quiver_width_z])
             self.fields[name].quiver_scale = max_upper / max_spacing
 
-            # Redraw the quiver with new scale
-            self.quiver.remove()
-            quiver_scale = self.fields[name].quiver_scale
-            subset = self.quiver_subset
-            args = [self.X[subset], self.Z[subset]]
-            args += [new_comp_1[subset], new_comp_2[subset]]
-            kwargs = {"color": "k", "scale": quiver_scale, "width": 0.006}
-            kwargs.update({"angles": "xy", "zorder": 2, "rasterized": True})
-            kwargs.update({"scale_units": "xy"})
-            self.quiver = self.ax.quiver(*args, **kwargs)
-            self.quiver.set_visible(self.quiver_visible)
+            # Rescale the quiver and its key in place, as the scale is read when drawn
+            self.quiver.scale = self.fields[name].quiver_scale
+            self.quiver.scale_units = "xy"
+            self.quiver.stale = True
+            self.update_quiver_key()
 
-            if self.quiver_visible:
-                self.rebuild_quiver_key()
-
-    def rebuild_quiver_key(self):
-        """Rebuild the quiver key."""
+    def update_quiver_key(self):
+        """Update the quiver key magnitude, label and visibility in place."""
 
         name = self.active_quiver_field
-        try:
-            self.quiver_key.remove()
-        except ValueError:
-            pass
-
         quiver_key_mag = self.fields[name].quiver_key_magnitude
-        args = [self.quiver, 0.09, 1.05, quiver_key_mag]
-        args += [f"{quiver_key_mag} [-]"]
-        kwargs = {"labelpos": "E", "coordinates": "axes"}
-        self.quiver_key = self.ax.quiverkey(*args, **kwargs)
+        self.quiver_key.U = quiver_key_mag
         self.update_quiver_key_label()
-        self.quiver_key.text.set_text(self.quiver_key_label)
-        self.quiver_key.set_visible(self.quiver_visible)
+        self.set_quiver_key_text()
+        self.set_quiver_key_visible(self.quiver_visible)
+        self.quiver_key.stale = True
+
+    def set_quiver_key_visible(self, visible):
+        """
+        Set the visibility of the quiver key. Note the key draws its arrow and label
+        regardless of its own visibility, so these are set too.
+        """
+        self.quiver_key.set_visible(visible)
+        self.quiver_key.vector.set_visible(visible)
+        self.quiver_key.text.set_visible(visible)
 
 
 def bounds_half_order_magnitude(value):
@@ -954,3 +1268,53 @@ def bounds_half_order_magnitude(value):
     upper_bound = upper * 10**order
 
     return (lower_bound, upper_bound)
+
+
+def same_scale_decisions(value_1, value_2, max_lower, max_upper):
+    """
+    Check whether two estimates of a field's typical magnitude lead update_fields to the
+    same colour or quiver scale, i.e. compare the same way with the current bounds and
+    round to the same half order of magnitude.
+    """
+    compare_1 = (value_1 > max_upper, value_1 < max_lower)
+    compare_2 = (value_2 > max_upper, value_2 < max_lower)
+    bounds_1 = bounds_half_order_magnitude(value_1)
+    bounds_2 = bounds_half_order_magnitude(value_2)
+    return compare_1 == compare_2 and bounds_1 == bounds_2
+
+
+def scale_percentile(field, percentile, max_lower, max_upper, sample_size=4096):
+    """
+    Get np.nanpercentile(np.abs(field), percentile) for choosing a scale, estimated from
+    a stratified random sample of the field, i.e. one point at a random offset in each
+    stride, so periodic structure in the field, e.g. along its rows, cannot align with
+    the sample. The order statistics of the sample bracketing the percentile at four
+    standard deviations are checked to give the same scale decisions. As the decisions
+    are monotonic, the estimate then gives the same decisions as the exact percentile
+    unless the exact percentile lies outside this interval. This is a probabilistic
+    bound, failing with a probability of order 1e-4 by the normal approximation to the
+    count of sampled points below the percentile. If the order statistics disagree,
+    e.g. near the boundary of a half order of magnitude, the exact percentile is
+    calculated instead.
+    """
+    flat = np.ravel(field)
+    step = flat.size // sample_size
+    if step <= 1:
+        return np.nanpercentile(np.abs(flat), percentile)
+    # Use a fixed seed, so the same field always gives the same scale
+    strata = flat.size // step
+    offsets = np.random.default_rng(0).integers(0, step, size=strata)
+    sample = np.abs(flat[np.arange(strata) * step + offsets])
+    sample = sample[~np.isnan(sample)]
+    n = sample.size
+    if n < sample_size // 4:
+        return np.nanpercentile(np.abs(flat), percentile)
+    q = percentile / 100
+    rank = q * (n - 1)
+    spread = 4 * np.sqrt(n * q * (1 - q)) + 1
+    low = int(max(np.floor(rank - spread), 0))
+    high = int(min(np.ceil(rank + spread), n - 1))
+    sample.partition([low, high])
+    if not same_scale_decisions(sample[low], sample[high], max_lower, max_upper):
+        return np.nanpercentile(np.abs(flat), percentile)
+    return np.percentile(sample, percentile)
@@ -1,7 +1,7 @@
 """Extensions of the BaseWaveModel elevated forcings."""
 
 from metoybox.model import core
-from metoybox.calculate import localized_line_forcing, gaussian_forcing
+from metoybox.calculate import localized_line_forcing, gaussian_forcing, symmetry
 
 
 class LocalizedLineForcingModel(core.BaseWaveModel):
@@ -9,19 +9,27 @@ class LocalizedLineForcingModel(core.BaseWaveModel):
     A linear theory model for an elevated localized line forcing.
     """
 
-    def calculate_fields(self, names):
+    field_variables = ("L", "z_f", "f_omega", "alpha_omega", "N_omega")
+
+    def calculate_fields(self, names, grid="full"):
         """Calculate the fields for the elevated localized line forcing model."""
 
-        # Update imshow field
-        new_fields = localized_line_forcing.calculate_fields_spatial(
-            self.X,
-            self.Z,
+        # Calculate half the domain and mirror the rest, where the grid allows
+        X, Z = self.get_grid(grid)
+        new_fields = symmetry.calculate_mirrored(
+            localized_line_forcing.calculate_fields_spatial,
+            X,
+            Z,
             self.non_dimensional_variables["L"],
             self.non_dimensional_variables["z_f"],
             self.non_dimensional_variables["f_omega"],
             self.non_dimensional_variables["alpha_omega"],
             self.non_dimensional_variables["N_omega"],
+            parity=localized_line_forcing.PARITY,
             fields=names,
+            out=self.get_output_buffers(names, grid),
+            workspace=self.get_workspace(grid),
+            dtype=self.dtype,
         )
         return new_fields
 
@@ -31,18 +39,26 @@ class GaussianTemporalForcingModel(core.BaseWaveModel):
     A linear theory model for an elevated Gaussian temporal forcing.
     """
 
-    def calculate_fields(self, names):
+    field_variables = ("z_f", "sigma", "f_omega", "alpha_omega", "N_omega")
+
+    def calculate_fields(self, names, grid="full"):
         """Calculate the fields for the elevated Gaussian temporal forcing model."""
 
-        # Update imshow field
-        new_fields = gaussian_forcing.calculate_fields_spatial(
-            self.X,
-            self.Z,
+        # Calculate half the domain and mirror the rest, where the grid allows
+        X, Z = self.get_grid(grid)
+        new_fields = symmetry.calculate_mirrored(
+            gaussian_forcing.calculate_fields_spatial,
+            X,
+            Z,
             self.non_dimensional_variables["z_f"],
             self.non_dimensional_variables["sigma"],
             self.non_dimensional_variables["f_omega"],
             self.non_dimensional_variables["alpha_omega"],
             self.non_dimensional_variables["N_omega"],
+            parity=gaussian_forcing.PARITY,
             fields=names,
+            out=self.get_output_buffers(names, grid),
+            workspace=self.get_workspace(grid),
+            dtype=self.dtype,
         )
         return new_fields
@@ -9,18 +9,23 @@ class PlaneWaveModel(core.BaseWaveModel):
     A basic plane wave.
     """
 
-    def calculate_fields(self, names):
+    field_variables = ("k", "sigma", "f_omega", "alpha_omega", "N_omega")
+
+    def calculate_fields(self, names, grid="full"):
         """Calculate the fields for the elevated localized line forcing model."""
 
-        # Update imshow field
+        X, Z = self.get_grid(grid)
         new_fields = plane_wave.calculate_fields_spatial(
-            self.X,
-            self.Z,
+            X,
+            Z,
             self.non_dimensional_variables["k"],
             self.non_dimensional_variables["sigma"],
             self.non_dimensional_variables["f_omega"],
             self.non_dimensional_variables["alpha_omega"],
             self.non_dimensional_variables["N_omega"],
             fields=names,
+            out=self.get_output_buffers(names, grid),
+            workspace=self.get_workspace(grid),
+            dtype=self.dtype,
         )
-        return new_fields
\ No newline at end of file
+        return new_fields
@@ -1,7 +1,7 @@
 """Extensions of the BaseWaveModel elevated forcings."""
 
 from metoybox.model import core
-from metoybox.calculate import land_sea
+from metoybox.calculate import land_sea, symmetry
 
 
 class LandSeaBreezeModel(core.BaseWaveModel):
@@ -9,17 +9,25 @@ class LandSeaBreezeModel(core.BaseWaveModel):
     A linear theory model for an elevated localized line forcing.
     """
 
-    def calculate_fields(self, names):
+    field_variables = ("L", "f_omega", "alpha_omega", "N_omega")
+
+    def calculate_fields(self, names, grid="full"):
         """Calculate the fields for the elevated localized line forcing model."""
 
-        # Update imshow field
-        new_fields = land_sea.calculate_fields_spatial(
-            self.X,
-            self.Z,
+        # Calculate half the domain and mirror the rest, where the grid allows
+        X, Z = self.get_grid(grid)
+        new_fields = symmetry.calculate_mirrored(
+            land_sea.calculate_fields_spatial,
+            X,
+            Z,
             self.non_dimensional_variables["L"],
             self.non_dimensional_variables["f_omega"],
             self.non_dimensional_variables["alpha_omega"],
             self.non_dimensional_variables["N_omega"],
+            parity=land_sea.PARITY,
             fields=names,
+            out=self.get_output_buffers(names, grid),
+            workspace=self.get_workspace(grid),
+            dtype=self.dtype,
         )
         return new_fields
@@ -2,6 +2,7 @@
 
 from metoybox.model import core
 from metoybox.calculate import slope_breeze, point_forcing_slope
+from metoybox.calculate.workspace import Workspace
 import matplotlib.colors as mcolors
 import numpy as np
 
@@ -15,6 +16,11 @@ class BaseSlopedModel(core.BaseWaveModel):
         """See the base class for input documentation."""
         super().__init__(*args, **kwargs)
         self.plot = None  # This will store the plot line for the slope.
+        # The rows below split_row cross the slope, and their above ground points are
+        # calculated as a packed list. These are only rebuilt when the slope M changes.
+        self.packed_M, self.split_row = None, None
+        self.packed_above, self.X_packed, self.Z_packed = None, None, None
+        self.packed_workspace = Workspace()
 
     def initialize_figure(self, *args, **kwargs):
         """
@@ -32,23 +38,75 @@ class BaseSlopedModel(core.BaseWaveModel):
         self.active_imshow_field = "psi"
         self.active_quiver_field = "velocity"
 
+    def update_packed_grid(self):
+        """
+        Split the grid into the rows above split_row, which lie entirely above the
+        slope, and the rows below, whose above ground points, marked by packed_above,
+        are packed into the coordinates X_packed and Z_packed.
+        """
+        M = self.non_dimensional_variables["M"]
+        if self.packed_M == M:
+            return
+        above = self.Z >= M * self.X
+        crossing_rows = np.flatnonzero(~np.all(above, axis=1))
+        self.split_row = crossing_rows[-1] + 1 if crossing_rows.size > 0 else 0
+        self.packed_above = above[: self.split_row]
+        rows, columns = np.nonzero(self.packed_above)
+        self.X_packed, self.Z_packed = self.x[columns], self.z[rows]
+        self.packed_M = M
+
+    def calculate_above_ground(self, function, *args, names, grid="full"):
+        """
+        Calculate the fields with function(X, Z, *args), the model's calculate module,
+        at the above ground points only. Rows entirely above the slope are calculated
+        on the open grid in place, and the packed points of the remaining rows are then
+        expanded into place with nan below the slope. The smaller grids of the quiver
+        and displacement lines are calculated directly.
+        """
+        kwargs = {"fields": names, "dtype": self.dtype}
+        if grid != "full":
+            X, Z = self.get_grid(grid)
+            out = self.get_output_buffers(names, grid)
+            workspace = self.get_workspace(grid)
+            return function(X, Z, *args, out=out, workspace=workspace, **kwargs)
+        self.update_packed_grid()
+        fields = self.get_output_buffers(names)
+        split = self.split_row
+        if split < len(self.z):
+            # The rows are contiguous blocks of the buffers, so calculate them in place
+            X, Z, workspace = self.X, self.Z[split:], self.workspace
+            out = {name: fields[name][split:] for name in names}
+            function(X, Z, *args, out=out, workspace=workspace, **kwargs)
+        if split > 0:
+            X, Z, workspace = self.X_packed, self.Z_packed, self.packed_workspace
+            shape = self.X_packed.shape
+            out = {}
+            for name in names:
+                out[name] = workspace.empty("packed_" + name, shape, self.dtype)
+            packed = function(X, Z, *args, out=out, workspace=workspace, **kwargs)
+            for name in names:
+                rows = fields[name][:split]
+                rows.fill((1 + 1j) * np.nan)
+                rows[self.packed_above] = packed[name]
+        return fields
+
     def update_figure_data(self):
         """Update the extra slope line element for sloped models."""
         super().update_figure_data()
-        self.plot.set_ydata(self.x * self.non_dimensional_variables["M"])
+        M = self.non_dimensional_variables["M"]
+        if self.changed("slope", M):
+            self.plot.set_ydata(self.x * M)
 
     def update_displacement_lines(self):
         """Update the displacement lines for sloped models."""
         super().update_displacement_lines()
         # Mask out any displacement lines below the slope
-        for line in self.displacement_lines.lines:
-            x_data, y_data = line.get_xdata(), line.get_ydata()
-            M = self.non_dimensional_variables["M"]
-            cond = y_data < M * x_data
-            x_data[cond] = np.nan
-            y_data[cond] = np.nan
-            line.set_xdata(x_data)
-            line.set_ydata(y_data)
+        lines = self.displacement_lines
+        M = self.non_dimensional_variables["M"]
+        below = lines.z_data < M * lines.x_data
+        lines.x_data[below] = np.nan
+        lines.z_data[below] = np.nan
+        lines.update_line()
 
 
 class MountainValleyModel(BaseSlopedModel):
@@ -56,20 +114,21 @@ class MountainValleyModel(BaseSlopedModel):
     A linear theory model for the mountain-valley breeze or low-level jet type flows.
     """
 
-    def calculate_fields(self, names):
+    field_variables = ("M", "f_omega", "alpha_omega", "N_omega")
+
+    def calculate_fields(self, names, grid="full"):
         """Calculate the fields for the mountain-valley model."""
 
-        # Update imshow field
-        new_fields = slope_breeze.calculate_fields_spatial(
-            self.X,
-            self.Z,
+        # Only calculate the fields at the points above the slope
+        return self.calculate_above_ground(
+            slope_breeze.calculate_fields_spatial,
             self.non_dimensional_variables["M"],
             self.non_dimensional_variables["f_omega"],
             self.non_dimensional_variables["alpha_omega"],
             self.non_dimensional_variables["N_omega"],
-            fields=names,
+            names=names,
+            grid=grid,
         )
-        return new_fields
 
 
 class PointForcingModel(BaseSlopedModel):
@@ -77,17 +136,18 @@ class PointForcingModel(BaseSlopedModel):
     A linear theory model for point forcing over a slope.
     """
 
-    def calculate_fields(self, names):
+    field_variables = ("M", "z_f", "f_omega", "alpha_omega", "N_omega")
+
+    def calculate_fields(self, names, grid="full"):
         """Calculate the fields for the point forcing over slope model."""
-        # Update imshow field
-        new_fields = point_forcing_slope.calculate_fields_spatial(
-            self.X,
-            self.Z,
+        # Only calculate the fields at the points above the slope
+        return self.calculate_above_ground(
+            point_forcing_slope.calculate_fields_spatial,
             self.non_dimensional_variables["M"],
             self.non_dimensional_variables["z_f"],
             self.non_dimensional_variables["f_omega"],
             self.non_dimensional_variables["alpha_omega"],
             self.non_dimensional_variables["N_omega"],
-            fields=names,
+            names=names,
+            grid=grid,
         )
-        return new_fields
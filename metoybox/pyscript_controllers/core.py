@@ -1,12 +1,13 @@
 """Base classes for building pyscript controllers."""
 
 from typing import Literal
-from metoybox.model.core import BaseWaveModel
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from metoybox.model.core import BaseWaveModel, ScalarField, VectorField
 from typing import Iterable
 
 # Import pyscript. Note these are not normal imports and typically confuse IDE linters!
 from pyscript import document, display, when
-from pyodide.ffi import create_proxy
+from pyodide.ffi import create_proxy, create_once_callable
 from js import window
 
 
@@ -33,6 +34,11 @@ class WebCache:
 default_non_dimensional = ["t", "N_omega", "alpha_omega", "f_omega"]
 default_dimensional = ["t_dim", "N", "alpha", "f", "Q_0", "H"]
 
+# The time in ms the controls must be at rest before likely next states are prefetched,
+# and the slider steps either side of the last value that are prefetched, in order
+PREFETCH_DELAY = 250
+PREFETCH_STEPS = [1, -1, 2, -2]
+
 
 class BaseWaveController:
     """Base class for pyscript controllers."""
@@ -66,6 +72,11 @@ class BaseWaveController:
         self.non_dimensional_sliders = [
             f"{container_id}-{name}-slider" for name in non_dimensional_variables
         ]
+        # The slider variable last changed, and the state of the prefetching of likely
+        # next states. Each event increments the generation, abandoning the prefetching.
+        self.last_variable: str | None = None
+        self.prefetch_generation = 0
+        self.prefetch_timer = None
         self._check_variables()
         self._register_event_handlers()
         name = self._get_active_imshow_field()
@@ -81,6 +92,7 @@ class BaseWaveController:
             self.model.fig, target=f"{self.container_id}-figure-output-A", append=False
         )
         self.change_coordinates(None)
+        self.schedule_prefetch()
 
     def initialize_feature_visibility(self):
         """Initialize the visibility of features based on checkbox/button states."""
@@ -91,11 +103,7 @@ class BaseWaveController:
         )
 
         self.model.quiver.set_visible(quiver_checkbox.checked)
-        if not quiver_checkbox.checked:
-            try:
-                self.model.quiver_key.remove()
-            except ValueError:
-                pass
+        self.model.set_quiver_key_visible(quiver_checkbox.checked)
         self.model.quiver_visible = quiver_checkbox.checked
 
         self.model.imshow.set_visible(imshow_checkbox.checked)
@@ -179,14 +187,14 @@ class BaseWaveController:
         @when("change", coords_str)
         def _change_coordinates(event):
             """Handle coordinate system change."""
-            self.change_coordinates(event)
+            self._handle_event(self.change_coordinates, event)
 
         checkbox_str = f"#{self.container_id}-displacement-checkbox"
 
         @when("change", checkbox_str)
         def _toggle_displacement_lines(event):
             """Handle displacement lines visibility change."""
-            self.toggle_displacement_lines(event)
+            self._handle_event(self.toggle_displacement_lines, event)
 
         quiver_str = f"#{self.container_id}-quiver-checkbox"
         imshow_str = f"#{self.container_id}-imshow-checkbox"
@@ -197,7 +205,7 @@ class BaseWaveController:
             """Handle feature visibility change."""
             # Note ID strings have the format {container_id}-{feature}-checkbox
             feature = event.target.id.split("-")[1]
-            self.toggle_feature(event, feature)
+            self._handle_event(self.toggle_feature, event, feature)
 
         time_sliders = [
             f"{self.container_id}-t-slider",
@@ -211,26 +219,113 @@ class BaseWaveController:
         @when("input", model_slider_str)
         def _update_model_variables(event):
             """Update the model variables based on the controller inputs."""
-            self.update_model_variables(event)
+            self._handle_event(self.update_model_variables, event)
 
         @when("input", time_slider_str)
         def _update_time(event):
             """Update the time variable."""
-            self.update_time(event)
+            self._handle_event(self.update_time, event)
 
         imshow_str = f"input[name='{self.container_id}-imshow-field']"
 
         @when("change", imshow_str)
         def _change_imshow_field(event):
             """Handle imshow field change."""
-            self.change_imshow_field(event)
+            self._handle_event(self.change_imshow_field, event)
 
         quiver_str = f"input[name='{self.container_id}-quiver-field']"
 
         @when("change", quiver_str)
         def _change_quiver_field(event):
             """Handle quiver field change."""
-            self.change_quiver_field(event)
+            self._handle_event(self.change_quiver_field, event)
+
+    def _handle_event(self, handler, event, *args):
+        """
+        Abandon any prefetching, handle the event, then prefetch likely next states
+        once the controls are at rest.
+        """
+        self.cancel_prefetch()
+        handler(event, *args)
+        self.schedule_prefetch()
+
+    def cancel_prefetch(self):
+        """Abandon the prefetching of likely next states."""
+        self.prefetch_generation += 1
+        if self.prefetch_timer is not None:
+            window.clearTimeout(self.prefetch_timer)
+            self.prefetch_timer = None
+
+    def schedule_prefetch(self, delay: float = PREFETCH_DELAY):
+        """
+        Prefetch likely next states after delay ms, one tile of rows of one field at a
+        time, yielding to the browser between tiles so each step is short and events
+        are handled promptly.
+        """
+        generation = self.prefetch_generation
+        steps = self._prefetch_steps()
+
+        def step():
+            if generation != self.prefetch_generation:
+                return
+            try:
+                next(steps)
+            except StopIteration:
+                self.prefetch_timer = None
+                return
+            callback = create_once_callable(step)
+            self.prefetch_timer = window.setTimeout(callback, 0)
+
+        callback = create_once_callable(step)
+        self.prefetch_timer = window.setTimeout(callback, delay)
+
+    def _prefetch_steps(self):
+        """
+        Generate the steps of prefetching the likely next states, most likely first.
+        These are the current fields at nearby values of the slider last changed, then
+        the other fields at the current values.
+        """
+        model = self.model
+        fields = model.fields
+        quiver_names = list(fields[model.active_quiver_field].fields.keys())
+        grids = [([model.active_imshow_field], "full"), (quiver_names, "quiver")]
+        if model.displacement_lines.visible:
+            grids.append((model.displacement_lines.fields, "lines"))
+        if self.last_variable is not None:
+            name = self.last_variable
+            control = self.cache.get(f"{self.container_id}-{name}-slider")
+            for steps in PREFETCH_STEPS:
+                value = self._step_value(control, steps)
+                if value is None:
+                    continue
+                for names, grid in grids:
+                    yield from model.prefetch_fields(names, grid, {name: value})
+        for name, field in fields.items():
+            if isinstance(field, VectorField) and name != model.active_quiver_field:
+                yield from model.prefetch_fields(list(field.fields.keys()), "quiver")
+            elif isinstance(field, ScalarField) and name != model.active_imshow_field:
+                yield from model.prefetch_fields([name], "full")
+
+    def _step_value(self, control, steps: int) -> float | None:
+        """
+        Get the value of the slider control moved by steps, or None if it cannot move
+        that far or has no step. Like the browser, the value is rounded to the nearest
+        min + n * step in decimal arithmetic, so it matches the value of a real event.
+        """
+        try:
+            minimum = Decimal(control.min or "0")
+            maximum = Decimal(control.max or "100")
+            step = Decimal(control.step or "1")
+            value = Decimal(control.value)
+        except InvalidOperation:
+            # E.g. step="any"
+            return None
+        if step <= 0:
+            return None
+        n = ((value - minimum) / step).to_integral_value(ROUND_HALF_UP) + steps
+        if n < 0 or minimum + n * step > maximum:
+            return None
+        return float(minimum + n * step)
 
     def _is_dimensional_mode(self):
         """Check if the controller is in dimensional mode."""
@@ -288,12 +383,9 @@ class BaseWaveController:
         if feature == "quiver":
             self.model.quiver_visible = visible
             if visible:
-                self.model.rebuild_quiver_key()
+                self.model.update_quiver_key()
             else:
-                try:
-                    self.model.quiver_key.remove()
-                except ValueError:
-                    pass
+                self.model.set_quiver_key_visible(False)
         elif feature == "imshow":
             self.model.colorbar.ax.set_visible(visible)
             self.model.imshow_visible = visible
@@ -330,6 +422,8 @@ class BaseWaveController:
 
     def change_coordinates(self, event):
         """Handle coordinate system change."""
+        # The sliders of the other coordinate system are now hidden
+        self.last_variable = None
         dim_var = self.model.dimensional_variables
         non_dim_var = self.model.non_dimensional_variables
         if self._is_dimensional_mode():
@@ -362,6 +456,7 @@ class BaseWaveController:
         """Update the model variables based on the controller inputs."""
         name = event.target.id
         key = name.replace(control_suffix, "").replace(f"{self.container_id}-", "")
+        self.last_variable = key
         control = self.cache.get(name)
         if self._is_dimensional_mode():
             self.model.dimensional_variables[key] = float(control.value)
@@ -370,7 +465,10 @@ class BaseWaveController:
         else:
             self.model.non_dimensional_variables[key] = float(control.value)
         self._update_outputs([key])
-        self.model.update_fields()
+        # Only recalculate the fields if the variable changes them, e.g. not for Q_0,
+        # which only changes the scalings and hence the labels and displacement lines
+        if self.model.fields_invalidated():
+            self.model.update_fields()
         self.model.update_figure_data()
         self.redraw()
 
@@ -0,0 +1,71 @@
+"""Tests for caching the fields of the calculate modules."""
+
+import os
+import numpy as np
+from metoybox.calculate import cache, plane_wave
+from metoybox.calculate.cache import DiskFieldCache, calculate_cached
+
+
+def test_key_number_types(tmp_path):
+    """Keys with equal numbers of different types name the same file."""
+    disk_cache = DiskFieldCache(tmp_path)
+    path = disk_cache.path(("model", (("L", 0.5), ("N", 2.0)), "psi"))
+    keys = [
+        ("model", (("L", np.float64(0.5)), ("N", 2)), "psi"),
+        ("model", [["L", np.float32(0.5)], ["N", np.int64(2)]], "psi"),
+    ]
+    assert all(disk_cache.path(key) == path for key in keys)
+    assert disk_cache.path(("model", (("L", 0.5), ("N", 2.5)), "psi")) != path
+
+
+def test_get_without_utime(tmp_path, monkeypatch):
+    """Files are still read if their modification time cannot be updated."""
+    disk_cache = DiskFieldCache(tmp_path)
+    disk_cache.put("key", np.arange(4.0))
+
+    def utime(*args, **kwargs):
+        raise PermissionError
+
+    monkeypatch.setattr(os, "utime", utime)
+    np.testing.assert_array_equal(disk_cache.get("key"), np.arange(4.0))
+
+
+def test_evict_least_recently_used(tmp_path, monkeypatch):
+    """The directory is only scanned when the budget is exceeded."""
+    array = np.zeros(1000)
+    size = array.nbytes + 128  # The .npy header
+    disk_cache = DiskFieldCache(tmp_path, max_bytes=int(3.5 * size))
+    scans = []
+    files = disk_cache.files
+    monkeypatch.setattr(disk_cache, "files", lambda: scans.append(1) or files())
+    for i in range(3):
+        disk_cache.put(i, array)
+        os.utime(disk_cache.path(i), (i, i))
+    assert not scans
+    disk_cache.put(3, array)
+    assert len(scans) == 1
+    assert disk_cache.get(0) is None and disk_cache.get(3) is not None
+    assert disk_cache.nbytes <= cache.EVICT_FRACTION * disk_cache.max_bytes
+
+
+def test_calculate_cached(tmp_path, monkeypatch):
+    """Fields are read through the cache by direct callers of the kernels."""
+    X, Z = np.meshgrid(np.linspace(-2, 2, 21), np.linspace(0, 4, 11), sparse=True)
+    args = (1.5, 1.0, 0.5, 0.1, 2.0)
+    function = plane_wave.calculate_fields_spatial
+    expected = function(X, Z, *args, fields=["psi", "u"])
+    calculate_cached(function, DiskFieldCache(tmp_path), X, Z, *args, fields=["psi"])
+
+    calls = []
+
+    def counted(*args, **kwargs):
+        calls.append(kwargs["fields"])
+        return function(*args, **kwargs)
+
+    counted.__module__ = function.__module__
+    counted.__qualname__ = function.__qualname__
+    disk_cache = DiskFieldCache(tmp_path)
+    fields = calculate_cached(counted, disk_cache, X, Z, *args, fields=["psi", "u"])
+    assert calls == [["u"]]
+    for name in expected:
+        np.testing.assert_array_equal(fields[name], expected[name])
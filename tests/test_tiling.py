@@ -0,0 +1,29 @@
+"""Tests for evaluating the calculate modules in tiles."""
+
+import tracemalloc
+import numpy as np
+import pytest
+from metoybox.calculate import land_sea
+from metoybox.calculate.tiling import calculate_tiled
+
+
+@pytest.mark.parametrize("dtype", [np.complex128, np.complex64])
+def test_tiles_within_memory_budget(dtype):
+    """Tiled kernels with double precision temporaries fit the budget for any dtype."""
+    X, Z = np.meshgrid(np.linspace(-2, 2, 400), np.linspace(0, 4, 400), sparse=True)
+    fields = ["psi", "u", "w"]
+    out = {name: np.empty((400, 400), dtype) for name in fields}
+    args = (X, Z, 0.5, 0.5, 0.1, 2.0)
+    memory_budget = 4 * 2**20
+    kwargs = {"fields": fields, "out": out, "dtype": dtype, "max_workers": 1}
+    tracemalloc.start()
+    try:
+        function = land_sea.calculate_fields_spatial
+        calculate_tiled(function, *args, memory_budget=memory_budget, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < memory_budget
+    expected = land_sea.calculate_fields_spatial(*args, fields=fields, dtype=dtype)
+    for name in fields:
+        np.testing.assert_allclose(out[name], expected[name], rtol=1e-4, atol=1e-6)
@@ -0,0 +1,81 @@
+"""Tests for reusing workspaces between calls to the calculate modules."""
+
+import tracemalloc
+import numpy as np
+import pytest
+from metoybox.calculate import land_sea, plane_wave, slope_breeze
+from metoybox.calculate.workspace import Workspace, grid_key
+
+# The calculate functions and their arguments after the grid
+KERNELS = {
+    "plane_wave": (plane_wave.calculate_fields_spatial, (1.5, 1.0, 0.5, 0.1, 2.0)),
+    "slope_breeze": (slope_breeze.calculate_fields_spatial, (0.2, 0.5, 0.1, 2.0)),
+    "land_sea": (land_sea.calculate_fields_spatial, (0.5, 0.5, 0.1, 2.0)),
+    # Without friction the exponential integrals are interpolated
+    "land_sea_interpolated": (land_sea.calculate_fields_spatial, (0.5, 0.5, 0.0, 2.0)),
+}
+
+
+def test_grid_key_uses_contents():
+    """Grids with the same memory but different values get different keys."""
+    x = np.linspace(-2, 2, 11)
+    key = grid_key(x)
+    x += 1
+    assert grid_key(x) != key
+    assert grid_key(x.copy()) == grid_key(x)
+
+
+@pytest.mark.parametrize("name", KERNELS)
+def test_workspace_reused_across_grids(name):
+    """A workspace reused for different grids gives the same fields as no workspace."""
+    function, args = KERNELS[name]
+    workspace = Workspace()
+    x, z = np.linspace(-2, 2, 41), np.linspace(0.05, 4, 31)
+    X, Z = np.meshgrid(x, z, sparse=True)
+    for shift in [0.0, 0.3, 0.6]:
+        # Modify the grids in place, so the new grids occupy the memory of the old
+        X += shift
+        Z += shift
+        fields = function(X, Z, *args, workspace=workspace)
+        expected = function(X.copy(), Z.copy(), *args)
+        for field in expected:
+            np.testing.assert_allclose(fields[field], expected[field], equal_nan=True)
+
+
+def test_failed_fill_recomputed(monkeypatch):
+    """A cached array left partly filled by an exception is recomputed next call."""
+    function, args = KERNELS["plane_wave"]
+    X, Z = np.meshgrid(np.linspace(-2, 2, 41), np.linspace(0, 4, 31), sparse=True)
+    expected = function(X, Z, *args)
+    psi_shape = plane_wave.psi_shape
+
+    def failing(X, Z, k, m, out):
+        out[...] = 0
+        raise MemoryError
+
+    workspace = Workspace()
+    monkeypatch.setattr(plane_wave, "psi_shape", failing)
+    with pytest.raises(MemoryError):
+        function(X, Z, *args, workspace=workspace)
+    monkeypatch.setattr(plane_wave, "psi_shape", psi_shape)
+    fields = function(X, Z, *args, workspace=workspace)
+    for field in expected:
+        np.testing.assert_allclose(fields[field], expected[field])
+
+
+@pytest.mark.parametrize("dtype", [np.complex128, np.complex64])
+def test_land_sea_steady_state_allocation(dtype):
+    """A repeated land-sea call with an unchanged state allocates no full size grid."""
+    X, Z = np.meshgrid(np.linspace(-2, 2, 301), np.linspace(0, 4, 301), sparse=True)
+    fields = ["psi", "u", "w"]
+    out = {name: np.empty((301, 301), dtype) for name in fields}
+    kwargs = {"fields": fields, "out": out, "workspace": Workspace(), "dtype": dtype}
+    args = (X, Z, 0.5, 0.5, 0.1, 2.0)
+    land_sea.calculate_fields_spatial(*args, **kwargs)
+    tracemalloc.start()
+    try:
+        land_sea.calculate_fields_spatial(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < out["psi"].nbytes